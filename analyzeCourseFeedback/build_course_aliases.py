@@ -0,0 +1,148 @@
+import sqlite3
+import logging
+import os
+
+# ----------------------------
+# Configuration
+# ----------------------------
+
+DATABASE_PATH = 'course_feedback.db'  # Run after scrapeFeedback.py; safe to re-run
+COURSE_URLS_PATH = 'getCourseLinks/course_urls.db'
+ERROR_LOG_PATH = 'error.log'
+
+logging.basicConfig(
+    filename=ERROR_LOG_PATH,
+    filemode='a',
+    level=logging.ERROR,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# ----------------------------
+# Alias Functions
+# ----------------------------
+
+def split_listing(course_id):
+    """'ECON\xa020000' or 'ECON 20000' -> ('ECON', 20000), or None if it isn't a course number."""
+    parts = course_id.split() if course_id else []
+    if len(parts) < 2 or not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1])
+
+def group_listings(listing_urls):
+    """
+    Group cross-listed courses: listings that share a feedback url are the same course.
+
+    Args:
+        listing_urls (iterable): (listing, url) pairs, listing being a (dept, course_id) tuple.
+
+    Returns:
+        list: Sets of listings, one per course with more than one listing.
+    """
+    parent = {}
+
+    def find(listing):
+        root = listing
+        while parent[root] != root:
+            root = parent[root]
+        while parent[listing] != root:
+            parent[listing], listing = root, parent[listing]
+        return root
+
+    first_listing = {}
+    for listing, url in listing_urls:
+        parent.setdefault(listing, listing)
+        other = first_listing.setdefault(url, listing)
+        parent[find(listing)] = find(other)
+
+    groups = {}
+    for listing in parent:
+        groups.setdefault(find(listing), set()).add(listing)
+    return [group for group in groups.values() if len(group) > 1]
+
+def canonical_aliases(groups, row_counts):
+    """
+    Pick the listing each cross-listed course's feedback is looked up under.
+
+    scrapeFeedback.py scrapes each url once, so a report is stored under whichever listing
+    came first and the other listings have no rows. The canonical listing is the one with
+    the most feedback rows; listings without rows of their own become aliases of it.
+    Listings that do have rows keep their own averages.
+
+    Args:
+        groups (list): Sets of cross-listed (dept, course_id) tuples from group_listings.
+        row_counts (dict): (dept, course_id) -> number of rows in courses.
+
+    Returns:
+        dict: (dept, course_id) -> canonical (dept, course_id).
+    """
+    aliases = {}
+    for group in groups:
+        stored = [listing for listing in group if row_counts.get(listing)]
+        if not stored:
+            continue
+        canonical = min(stored, key=lambda listing: (-row_counts[listing], listing))
+        for listing in group:
+            if listing not in row_counts:
+                aliases[listing] = canonical
+    return aliases
+
+def build_course_aliases(db_path, course_urls_path):
+    """
+    Rebuild course_aliases: every cross-listing without feedback of its own, mapped to the
+    listing its feedback is stored under, so the backend resolves a course in one lookup
+    instead of trying each of the search page's other listings.
+    """
+    for path in (db_path, course_urls_path):
+        if not os.path.exists(path):
+            logging.error(f"Database file '{path}' does not exist.")
+            print(f"Error: Database file '{path}' does not exist. Check the log for details.")
+            return
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Listings from the link scrape, plus the listing each scraped report was stored under
+        conn.execute("ATTACH DATABASE ? AS links", (course_urls_path,))
+        cursor.execute("SELECT course_id, url FROM links.course_urls WHERE url IS NOT NULL")
+        listing_urls = [(split_listing(course_id), url) for course_id, url in cursor.fetchall()]
+        cursor.execute("SELECT dept, course_id, url FROM courses WHERE course_id IS NOT NULL AND url IS NOT NULL")
+        listing_urls += [((dept, int(course_id)), url) for dept, course_id, url in cursor.fetchall()]
+        conn.execute("DETACH DATABASE links")
+
+        cursor.execute("SELECT dept, course_id, COUNT(*) FROM courses WHERE course_id IS NOT NULL GROUP BY dept, course_id")
+        row_counts = {(dept, int(course_id)): count for dept, course_id, count in cursor.fetchall()}
+
+        groups = group_listings((listing, url) for listing, url in listing_urls if listing is not None)
+        aliases = canonical_aliases(groups, row_counts)
+
+        conn.execute('BEGIN TRANSACTION;')
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS course_aliases (
+                dept TEXT NOT NULL,
+                course_id INTEGER NOT NULL,
+                canonical_dept TEXT NOT NULL,
+                canonical_course_id INTEGER NOT NULL,
+                PRIMARY KEY (dept, course_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("DELETE FROM course_aliases")
+        cursor.executemany(
+            "INSERT INTO course_aliases (dept, course_id, canonical_dept, canonical_course_id) VALUES (?, ?, ?, ?)",
+            [listing + canonical for listing, canonical in aliases.items()]
+        )
+        conn.commit()
+        print(f"Found {len(groups)} cross-listed courses; aliased {len(aliases)} listings.")
+    except sqlite3.Error as e:
+        logging.error(f"Error building course aliases: {e}")
+        print("Database error occurred while building the course aliases. Check the log for details.")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+# ----------------------------
+# Main Execution
+# ----------------------------
+
+if __name__ == "__main__":
+    build_course_aliases(DATABASE_PATH, COURSE_URLS_PATH)
@@ -0,0 +1,74 @@
+import sqlite3
+import logging
+import os
+import sys
+
+# name_keys.py lives with the backend, which normalizes incoming instructor names the same way
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from name_keys import build_name_index  # noqa: E402
+
+# ----------------------------
+# Configuration
+# ----------------------------
+
+DATABASE_PATH = 'course_feedback.db'  # Run after scrapeFeedback.py; safe to re-run
+ERROR_LOG_PATH = 'error.log'
+
+logging.basicConfig(
+    filename=ERROR_LOG_PATH,
+    filemode='a',
+    level=logging.ERROR,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# ----------------------------
+# Index Functions
+# ----------------------------
+
+def build_professor_name_keys(db_path):
+    """
+    Rebuild professor_name_keys: one row per (normalized name key, dept) with the professor
+    id the backend should return for it, so each instructor is a single exact probe.
+    """
+    if not os.path.exists(db_path):
+        logging.error(f"Database file '{db_path}' does not exist.")
+        print(f"Error: Database file '{db_path}' does not exist. Check the log for details.")
+        return
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id, first_name, last_name, dept FROM professors")
+        index = build_name_index(cursor.fetchall())
+
+        conn.execute('BEGIN TRANSACTION;')
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS professor_name_keys (
+                name_key TEXT NOT NULL,
+                dept TEXT NOT NULL,
+                professor_id INTEGER NOT NULL,
+                PRIMARY KEY (name_key, dept)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("DELETE FROM professor_name_keys")
+        cursor.executemany(
+            "INSERT INTO professor_name_keys (name_key, dept, professor_id) VALUES (?, ?, ?)",
+            [(key, dept, professor_id) for (key, dept), professor_id in index.items()]
+        )
+        conn.commit()
+        print(f"Indexed {len(index)} name keys.")
+    except sqlite3.Error as e:
+        logging.error(f"Error building professor name keys: {e}")
+        print("Database error occurred while building the name index. Check the log for details.")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+# ----------------------------
+# Main Execution
+# ----------------------------
+
+if __name__ == "__main__":
+    build_professor_name_keys(DATABASE_PATH)
@@ -1,6 +1,12 @@
 import sqlite3
 import logging
 import os
+import sys
+
+# schema_migrations.py lives with the backend, which checks the same schema version
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from schema_migrations import migrate  # noqa: E402
 
 # ----------------------------
 # Configuration
@@ -9,37 +15,6 @@ import os
 DATABASE_PATH = 'course_feedback.db'  # Replace with your actual database file
 ERROR_LOG_PATH = 'error.log'
 
-REQUIRED_COLUMNS = {
-    "courses_professors": ["avg_prof_course_hours", "avg_prof_course_rating"],
-    "courses": ["avg_course_hours", "avg_course_rating"],
-    "professors": ["avg_professor_rating"]
-}
-
-def add_missing_columns(db_path, required_columns):
-    """Ensures all required columns exist in the database."""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        for table, columns in required_columns.items():
-            cursor.execute(f"PRAGMA table_info({table});")
-            existing_columns = {row[1] for row in cursor.fetchall()}
-            
-            for column in columns:
-                if column not in existing_columns:
-                    print(f"Adding missing column: {table}.{column}")
-                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL;")
-                    conn.commit()
-        
-        conn.close()
-        print("All missing columns added successfully.")
-    except sqlite3.Error as e:
-        logging.error(f"Error adding missing columns: {e}")
-        print("Database error occurred while adding missing columns. Check the log for details.")
-
-# Run the function to add missing columns
-add_missing_columns(DATABASE_PATH, REQUIRED_COLUMNS)
-
 # ----------------------------
 # Execution Function
 # ----------------------------
@@ -52,9 +27,13 @@ def execute_sql_queries(db_path, queries):
 
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
         print("Connected to the database.")
 
+        # Creates the average columns and indexes on databases that don't have them yet
+        for name in migrate(conn):
+            print(f"Applied schema migration: {name}")
+
+        cursor = conn.cursor()
         conn.execute('BEGIN TRANSACTION;')
 
         for name, query in queries.items():
@@ -81,173 +60,135 @@ def execute_sql_queries(db_path, queries):
             print("Database connection closed.")
 
 
+# Each serving table is emptied and rebuilt with one grouped pass over the feedback rows,
+# one row per lookup key (see create_serving_tables in schema_migrations.py). Nothing is
+# written back onto the courses / professors / courses_professors rows any more.
 SQL_QUERIES = {
-    "avg_prof_course_hours": """
-        UPDATE courses_professors
-        SET avg_prof_course_hours = (
-            SELECT 
+    "clear_prof_course_stats": "DELETE FROM prof_course_stats;",
+    "prof_course_stats": """
+        INSERT INTO prof_course_stats (professor_id, dept, course_id, avg_prof_course_rating, avg_prof_course_hours)
+        SELECT
+            cp.professor_id,
+            c.dept,
+            c.course_id,
+            (
+                COALESCE(SUM(c.challenge_intellect), 0) +
+                COALESCE(SUM(c.purpose), 0) +
+                COALESCE(SUM(c.standards), 0) +
+                COALESCE(SUM(c.feedback), 0) +
+                COALESCE(SUM(c.fairness), 0) +
+                COALESCE(SUM(c.respect), 0) +
+                COALESCE(SUM(c.excellence), 0) +
+                COALESCE(SUM(c.organization), 0) +
+                COALESCE(SUM(c.challenge), 0) +
+                COALESCE(SUM(c.available), 0) +
+                COALESCE(SUM(c.inclusive), 0) +
+                COALESCE(SUM(c.significant), 0)
+            ) / NULLIF(
                 (
-                    COALESCE(SUM(c.less_five * 2.5), 0) +
-                    COALESCE(SUM(c.five_to_ten * 7.5), 0) +
-                    COALESCE(SUM(c.ten_to_fifteen * 12.5), 0) +
-                    COALESCE(SUM(c.fifteen_to_twenty * 17.5), 0) +
-                    COALESCE(SUM(c.twenty_to_twenty_five * 22.5), 0) +
-                    COALESCE(SUM(c.twenty_five_to_thirty * 27.5), 0) +
-                    COALESCE(SUM(c.more_thirty * 32.5), 0)
-                ) / NULLIF(
-                    (
-                        COALESCE(SUM(c.less_five), 0) +
-                        COALESCE(SUM(c.five_to_ten), 0) +
-                        COALESCE(SUM(c.ten_to_fifteen), 0) +
-                        COALESCE(SUM(c.fifteen_to_twenty), 0) +
-                        COALESCE(SUM(c.twenty_to_twenty_five), 0) +
-                        COALESCE(SUM(c.twenty_five_to_thirty), 0) +
-                        COALESCE(SUM(c.more_thirty), 0)
-                    ), 0
-                )
-            FROM courses_professors cp_inner
-            JOIN courses c ON cp_inner.course_id = c.id
-            WHERE cp_inner.professor_id = courses_professors.professor_id
-              AND c.dept = (SELECT dept FROM courses WHERE id = courses_professors.course_id)
-              AND c.course_id = (SELECT course_id FROM courses WHERE id = courses_professors.course_id)
-        )
-        WHERE EXISTS (
-            SELECT 1
-            FROM courses_professors cp_inner
-            JOIN courses c ON cp_inner.course_id = c.id
-            WHERE cp_inner.professor_id = courses_professors.professor_id
-              AND c.dept = (SELECT dept FROM courses WHERE id = courses_professors.course_id)
-              AND c.course_id = (SELECT course_id FROM courses WHERE id = courses_professors.course_id)
-        );
-    """,
-    "avg_prof_course_rating": """
-        UPDATE courses_professors
-        SET avg_prof_course_rating = (
-            SELECT 
+                    COUNT(c.challenge_intellect) +
+                    COUNT(c.purpose) +
+                    COUNT(c.standards) +
+                    COUNT(c.feedback) +
+                    COUNT(c.fairness) +
+                    COUNT(c.respect) +
+                    COUNT(c.excellence) +
+                    COUNT(c.organization) +
+                    COUNT(c.challenge) +
+                    COUNT(c.available) +
+                    COUNT(c.inclusive) +
+                    COUNT(c.significant)
+                ), 0
+            ),
+            (
+                COALESCE(SUM(c.less_five * 2.5), 0) +
+                COALESCE(SUM(c.five_to_ten * 7.5), 0) +
+                COALESCE(SUM(c.ten_to_fifteen * 12.5), 0) +
+                COALESCE(SUM(c.fifteen_to_twenty * 17.5), 0) +
+                COALESCE(SUM(c.twenty_to_twenty_five * 22.5), 0) +
+                COALESCE(SUM(c.twenty_five_to_thirty * 27.5), 0) +
+                COALESCE(SUM(c.more_thirty * 32.5), 0)
+            ) / NULLIF(
                 (
-                    COALESCE(SUM(c.challenge_intellect), 0) +
-                    COALESCE(SUM(c.purpose), 0) +
-                    COALESCE(SUM(c.standards), 0) +
-                    COALESCE(SUM(c.feedback), 0) +
-                    COALESCE(SUM(c.fairness), 0) +
-                    COALESCE(SUM(c.respect), 0) +
-                    COALESCE(SUM(c.excellence), 0) +
-                    COALESCE(SUM(c.organization), 0) +
-                    COALESCE(SUM(c.challenge), 0) +
-                    COALESCE(SUM(c.available), 0) +
-                    COALESCE(SUM(c.inclusive), 0) +
-                    COALESCE(SUM(c.significant), 0)
-                ) / NULLIF(
-                    (
-                        COUNT(c.challenge_intellect) +
-                        COUNT(c.purpose) +
-                        COUNT(c.standards) +
-                        COUNT(c.feedback) +
-                        COUNT(c.fairness) +
-                        COUNT(c.respect) +
-                        COUNT(c.excellence) +
-                        COUNT(c.organization) +
-                        COUNT(c.challenge) +
-                        COUNT(c.available) +
-                        COUNT(c.inclusive) +
-                        COUNT(c.significant)
-                    ), 0
-                )
-            FROM courses_professors cp_inner
-            JOIN courses c ON cp_inner.course_id = c.id
-            WHERE cp_inner.professor_id = courses_professors.professor_id
-              AND c.dept = (
-                  SELECT dept FROM courses WHERE id = courses_professors.course_id
-              )
-              AND c.course_id = (
-                  SELECT course_id FROM courses WHERE id = courses_professors.course_id
-              )
-        )
-        WHERE EXISTS (
-            SELECT 1
-            FROM courses_professors cp_inner
-            JOIN courses c ON cp_inner.course_id = c.id
-            WHERE cp_inner.professor_id = courses_professors.professor_id
-              AND c.dept = (
-                  SELECT dept FROM courses WHERE id = courses_professors.course_id
-              )
-              AND c.course_id = (
-                  SELECT course_id FROM courses WHERE id = courses_professors.course_id
-              )
-        );
+                    COALESCE(SUM(c.less_five), 0) +
+                    COALESCE(SUM(c.five_to_ten), 0) +
+                    COALESCE(SUM(c.ten_to_fifteen), 0) +
+                    COALESCE(SUM(c.fifteen_to_twenty), 0) +
+                    COALESCE(SUM(c.twenty_to_twenty_five), 0) +
+                    COALESCE(SUM(c.twenty_five_to_thirty), 0) +
+                    COALESCE(SUM(c.more_thirty), 0)
+                ), 0
+            )
+        FROM courses_professors cp
+        JOIN courses c ON cp.course_id = c.id
+        WHERE cp.professor_id IS NOT NULL AND c.dept IS NOT NULL AND c.course_id IS NOT NULL
+        GROUP BY cp.professor_id, c.dept, c.course_id;
     """,
-    "avg_course_hours": """
-        UPDATE courses
-        SET avg_course_hours = (
+    "clear_course_stats": "DELETE FROM course_stats;",
+    "course_stats": """
+        INSERT INTO course_stats (dept, course_id, avg_course_rating, avg_course_hours)
+        SELECT
+            dept,
+            course_id,
+            AVG(rating),
+            SUM(CASE WHEN total_responses > 0 THEN weighted_hours END) /
+                NULLIF(SUM(CASE WHEN total_responses > 0 THEN total_responses END), 0)
+        FROM (
             SELECT
-                SUM(weighted_hours) / NULLIF(SUM(total_responses), 0)
-            FROM (
-                SELECT
-                    (
-                        COALESCE(c2.less_five, 0) * 2.5 +
-                        COALESCE(c2.five_to_ten, 0) * 7.5 +
-                        COALESCE(c2.ten_to_fifteen, 0) * 12.5 +
-                        COALESCE(c2.fifteen_to_twenty, 0) * 17.5 +
-                        COALESCE(c2.twenty_to_twenty_five, 0) * 22.5 +
-                        COALESCE(c2.twenty_five_to_thirty, 0) * 27.5 +
-                        COALESCE(c2.more_thirty, 0) * 32.5
-                    ) AS weighted_hours,
-                    (
-                        COALESCE(c2.less_five, 0) +
-                        COALESCE(c2.five_to_ten, 0) +
-                        COALESCE(c2.ten_to_fifteen, 0) +
-                        COALESCE(c2.fifteen_to_twenty, 0) +
-                        COALESCE(c2.twenty_to_twenty_five, 0) +
-                        COALESCE(c2.twenty_five_to_thirty, 0) +
-                        COALESCE(c2.more_thirty, 0)
-                    ) AS total_responses
-                FROM courses c2
-                WHERE c2.dept = courses.dept AND c2.course_id = courses.course_id
-            ) sub
-            WHERE sub.total_responses > 0
-        );
-    """,
-    "avg_course_rating": """
-        UPDATE courses
-        SET avg_course_rating = (
-            SELECT AVG(rating)
-            FROM (
-                SELECT
-                    (
-                        COALESCE(c2.challenge_intellect, 0) +
-                        COALESCE(c2.purpose, 0) +
-                        COALESCE(c2.standards, 0) +
-                        COALESCE(c2.feedback, 0) +
-                        COALESCE(c2.fairness, 0) +
-                        COALESCE(c2.respect, 0) +
-                        COALESCE(c2.excellence, 0)
-                    ) /
-                    NULLIF(
-                        ((c2.challenge_intellect IS NOT NULL) +
-                        (c2.purpose IS NOT NULL) +
-                        (c2.standards IS NOT NULL) +
-                        (c2.feedback IS NOT NULL) +
-                        (c2.fairness IS NOT NULL) +
-                        (c2.respect IS NOT NULL) +
-                        (c2.excellence IS NOT NULL)),
-                        0
-                    ) AS rating
-                FROM courses AS c2
-                WHERE c2.dept = courses.dept AND c2.course_id = courses.course_id
-            ) sub
-            WHERE rating IS NOT NULL
-        )
-        WHERE EXISTS (
-            SELECT 1 FROM courses AS c2
-            WHERE c2.dept = courses.dept AND c2.course_id = courses.course_id
-        );
+                c.dept,
+                c.course_id,
+                (
+                    COALESCE(c.challenge_intellect, 0) +
+                    COALESCE(c.purpose, 0) +
+                    COALESCE(c.standards, 0) +
+                    COALESCE(c.feedback, 0) +
+                    COALESCE(c.fairness, 0) +
+                    COALESCE(c.respect, 0) +
+                    COALESCE(c.excellence, 0)
+                ) /
+                NULLIF(
+                    ((c.challenge_intellect IS NOT NULL) +
+                    (c.purpose IS NOT NULL) +
+                    (c.standards IS NOT NULL) +
+                    (c.feedback IS NOT NULL) +
+                    (c.fairness IS NOT NULL) +
+                    (c.respect IS NOT NULL) +
+                    (c.excellence IS NOT NULL)),
+                    0
+                ) AS rating,
+                (
+                    COALESCE(c.less_five, 0) * 2.5 +
+                    COALESCE(c.five_to_ten, 0) * 7.5 +
+                    COALESCE(c.ten_to_fifteen, 0) * 12.5 +
+                    COALESCE(c.fifteen_to_twenty, 0) * 17.5 +
+                    COALESCE(c.twenty_to_twenty_five, 0) * 22.5 +
+                    COALESCE(c.twenty_five_to_thirty, 0) * 27.5 +
+                    COALESCE(c.more_thirty, 0) * 32.5
+                ) AS weighted_hours,
+                (
+                    COALESCE(c.less_five, 0) +
+                    COALESCE(c.five_to_ten, 0) +
+                    COALESCE(c.ten_to_fifteen, 0) +
+                    COALESCE(c.fifteen_to_twenty, 0) +
+                    COALESCE(c.twenty_to_twenty_five, 0) +
+                    COALESCE(c.twenty_five_to_thirty, 0) +
+                    COALESCE(c.more_thirty, 0)
+                ) AS total_responses
+            FROM courses c
+            WHERE c.dept IS NOT NULL AND c.course_id IS NOT NULL
+        ) sub
+        GROUP BY dept, course_id;
     """,
-    "avg_professor_rating": """
-        UPDATE professors AS p_outer
-        SET avg_professor_rating = (
-            SELECT AVG(rating)
+    "clear_professor_stats": "DELETE FROM professor_stats;",
+    # Professors who share a last name within a department get the same rating, as before
+    "professor_stats": """
+        INSERT INTO professor_stats (professor_id, avg_professor_rating)
+        WITH name_ratings AS (
+            SELECT dept, last_name, AVG(rating) AS avg_professor_rating
             FROM (
                 SELECT
+                    p.dept,
+                    p.last_name,
                     (
                         COALESCE(c.organization, 0) +
                         COALESCE(c.challenge, 0) +
@@ -266,10 +207,12 @@ SQL_QUERIES = {
                 FROM courses AS c
                 INNER JOIN courses_professors AS cp ON c.id = cp.course_id
                 INNER JOIN professors AS p ON cp.professor_id = p.id
-                WHERE p.dept = p_outer.dept AND p.last_name = p_outer.last_name
             ) sub
-            WHERE rating IS NOT NULL
-        );
+            GROUP BY dept, last_name
+        )
+        SELECT p.id, r.avg_professor_rating
+        FROM professors p
+        LEFT JOIN name_ratings r ON r.dept = p.dept AND r.last_name = p.last_name;
     """
 }
 
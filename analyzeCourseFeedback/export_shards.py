@@ -0,0 +1,186 @@
+import sqlite3
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+
+# name_keys.py lives with the backend; shards use the same normalized name keys it does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from name_keys import build_name_index  # noqa: E402
+
+# Optional (pip install brotli): a .json.br copy of each shard, served to clients that accept br
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ----------------------------
+# Configuration
+# ----------------------------
+
+DATABASE_PATH = 'course_feedback.db'  # Run calculate_averages.py on this first
+SHARDS_DIR = '../courseFeedBackExtensionProduction/shards'  # Served by the backend at /shards/
+ERROR_LOG_PATH = 'error.log'
+KEEP_VERSIONS = 2  # Older shard versions are deleted so clients mid-update can still finish
+
+logging.basicConfig(
+    filename=ERROR_LOG_PATH,
+    filemode='a',
+    level=logging.ERROR,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# ----------------------------
+# Export Functions
+# ----------------------------
+
+def database_version(db_path):
+    """Content hash of the database; the backend derives the same version from the deployed copy."""
+    digest = hashlib.sha256()
+    with open(db_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def collect_shards(db_path):
+    """
+    Group every aggregate by department.
+
+    Returns:
+        dict: dept -> {
+            'courses': {course_id: [avg_course_rating, avg_course_hours]},
+            'professors': {name_key: [professor_id, avg_professor_rating]},
+            'professor_courses': {professor_id: {course_id: [avg_prof_course_rating, avg_prof_course_hours]}},
+            'aliases': {course_id: [canonical_dept, canonical_course_id]},
+        }
+        Professor-course entries live in the shard of the course's department. An alias
+        (a cross-listing with no feedback of its own, see build_course_aliases.py) lives in
+        the shard of its own department and points at the listing whose entries hold its
+        feedback, which may be in another department's shard.
+    """
+    shards = {}
+
+    def shard(dept):
+        if dept not in shards:
+            shards[dept] = {'courses': {}, 'professors': {}, 'professor_courses': {}, 'aliases': {}}
+        return shards[dept]
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # The serving tables calculate_averages.py builds, one row per key
+    cursor.execute("SELECT dept, course_id, avg_course_rating, avg_course_hours FROM course_stats")
+    for dept, course_id, rating, hours in cursor:
+        shard(dept)['courses'][str(int(course_id))] = [rating, hours]
+
+    # Keyed like the backend's lookups: name keys (see name_keys.py), looked up with lookup_names
+    cursor.execute("""
+        SELECT p.id, p.first_name, p.last_name, p.dept, s.avg_professor_rating
+        FROM professors p
+        LEFT JOIN professor_stats s ON s.professor_id = p.id
+    """)
+    professors = cursor.fetchall()
+    ratings = {prof_id: rating for prof_id, _, _, _, rating in professors}
+    name_index = build_name_index((prof_id, first, last, dept) for prof_id, first, last, dept, _ in professors)
+    for (name_key, dept), prof_id in name_index.items():
+        shard(dept)['professors'][name_key] = [prof_id, ratings[prof_id]]
+
+    cursor.execute("""
+        SELECT professor_id, dept, course_id, avg_prof_course_rating, avg_prof_course_hours
+        FROM prof_course_stats
+    """)
+    for professor_id, dept, course_id, rating, hours in cursor:
+        shard(dept)['professor_courses'].setdefault(str(professor_id), {})[str(int(course_id))] = [rating, hours]
+
+    # Cross-listings, as the backend resolves them. Databases without the table get no aliases
+    # and the extension tries the search page's other listings, like the backend does.
+    try:
+        cursor.execute("SELECT dept, course_id, canonical_dept, canonical_course_id FROM course_aliases")
+        for dept, course_id, canonical_dept, canonical_course_id in cursor.fetchall():
+            shard(dept)['aliases'][str(int(course_id))] = [canonical_dept, int(canonical_course_id)]
+    except sqlite3.OperationalError as e:
+        if 'course_aliases' not in str(e):
+            raise
+
+    conn.close()
+    return shards
+
+
+def write_gzip_json(path, payload):
+    """
+    Write payload as gzip'd JSON, plus a brotli copy next to it if brotli is installed.
+    mtime=0 keeps the bytes (and so the hash) reproducible. The manifest describes the .gz.
+    """
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    with open(path, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(raw)
+    if brotli is not None:
+        with open(path[:-len('.gz')] + '.br', 'wb') as f:
+            f.write(brotli.compress(raw, quality=11))
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest(), len(raw)
+
+
+def export_shards(db_path, shards_dir):
+    if not os.path.exists(db_path):
+        logging.error(f"Database file '{db_path}' does not exist.")
+        print(f"Error: Database file '{db_path}' does not exist. Check the log for details.")
+        return
+
+    version = database_version(db_path)
+    version_dir = os.path.join(shards_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    print(f"Exporting shards for database version {version}")
+
+    manifest = {'version': version, 'shards': {}}
+    for dept, payload in sorted(collect_shards(db_path).items()):
+        # Department codes become file names, so anything unexpected is skipped
+        if not dept or not re.fullmatch(r'[A-Za-z0-9_-]+', dept):
+            logging.error(f"Skipping shard for unexpected department code: {dept!r}")
+            continue
+        file_name = f"{dept}.json.gz"
+        content_hash, raw_size = write_gzip_json(os.path.join(version_dir, file_name), dict(payload, dept=dept, version=version))
+        manifest['shards'][dept] = {
+            'path': f"{version}/{file_name}",
+            'sha256': content_hash,
+            'size': os.path.getsize(os.path.join(version_dir, file_name)),
+            'raw_size': raw_size,
+            'courses': len(payload['courses']),
+        }
+
+    # The versioned manifest never changes; the top-level one is replaced atomically
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path = os.path.join(shards_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(shards_dir, 'manifest.json'))
+    print(f"Wrote {len(manifest['shards'])} department shards to {version_dir}")
+
+    prune_old_versions(shards_dir, version)
+
+
+def prune_old_versions(shards_dir, current_version):
+    """Delete all but the newest KEEP_VERSIONS shard directories."""
+    versions = [
+        entry for entry in os.listdir(shards_dir)
+        if os.path.isdir(os.path.join(shards_dir, entry)) and entry != current_version
+    ]
+    versions.sort(key=lambda entry: os.path.getmtime(os.path.join(shards_dir, entry)), reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        print(f"Removing old shard version {entry}")
+        shutil.rmtree(os.path.join(shards_dir, entry))
+
+# ----------------------------
+# Main Execution
+# ----------------------------
+
+if __name__ == "__main__":
+    export_shards(DATABASE_PATH, SHARDS_DIR)
@@ -0,0 +1,105 @@
+import logging
+import os
+import re
+import shutil
+import sys
+from export_shards import database_version
+
+# The snapshot file is the backend's own in-memory tables, so it is built with its code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from feedback_snapshot import load_snapshot  # noqa: E402
+from snapshot_file import snapshot_file_path, write_snapshot_file  # noqa: E402
+
+# ----------------------------
+# Configuration
+# ----------------------------
+
+DATABASE_PATH = 'course_feedback.db'  # Run calculate_averages.py on this first
+DEPLOY_DIR = '../courseFeedBackExtensionProduction'  # Where the backend's course_feedback.db lives
+DEPLOY_NAME = 'course_feedback'  # Versioned files are <DEPLOY_NAME>.<version>.db, the pointer <DEPLOY_NAME>.current
+ERROR_LOG_PATH = 'error.log'
+KEEP_VERSIONS = 2  # The live version plus the one before it, so in-flight requests and rollbacks still work
+
+logging.basicConfig(
+    filename=ERROR_LOG_PATH,
+    filemode='a',
+    level=logging.ERROR,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# ----------------------------
+# Publish Functions
+# ----------------------------
+
+def copy_atomically(source, destination):
+    """Copy source to destination so that destination either doesn't exist or is complete."""
+    tmp_path = destination + '.tmp'
+    with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, destination)
+
+
+def publish_database(db_path, deploy_dir):
+    """
+    Deploy db_path as an immutable, versioned file and point the backend at it.
+
+    The backend never sees a half-copied database: the versioned file is fully written
+    before it gets its final name, and the pointer file is replaced in one rename only
+    after that. The backend notices the new pointer, loads the new version in the
+    background and switches over when it's ready. Next to the database goes a snapshot
+    file (see snapshot_file.py) that the backend's workers map instead of loading it.
+    """
+    if not os.path.exists(db_path):
+        logging.error(f"Database file '{db_path}' does not exist.")
+        print(f"Error: Database file '{db_path}' does not exist. Check the log for details.")
+        return
+
+    version = database_version(db_path)
+    file_name = f"{DEPLOY_NAME}.{version}.db"
+    destination = os.path.join(deploy_dir, file_name)
+    if os.path.exists(destination):
+        print(f"Version {version} is already deployed as {destination}")
+    else:
+        copy_atomically(db_path, destination)
+        print(f"Copied {db_path} to {destination}")
+
+    # Written before the pointer moves, so workers map it instead of each loading the database
+    snapshot_path = snapshot_file_path(destination)
+    if not os.path.exists(snapshot_path):
+        write_snapshot_file(load_snapshot(destination, compact=True), snapshot_path, version)
+        print(f"Wrote {snapshot_path}")
+
+    pointer = os.path.join(deploy_dir, f"{DEPLOY_NAME}.current")
+    tmp_pointer = pointer + '.tmp'
+    with open(tmp_pointer, 'w') as f:
+        f.write(file_name + '\n')
+    os.replace(tmp_pointer, pointer)
+    print(f"{pointer} now points at {file_name}")
+
+    prune_old_versions(deploy_dir, file_name)
+
+
+def prune_old_versions(deploy_dir, current_file):
+    """
+    Delete all but the newest KEEP_VERSIONS versioned databases, with their snapshot files.
+    The current one is never deleted.
+    """
+    pattern = re.compile(re.escape(DEPLOY_NAME) + r'\.[0-9a-f]{16}\.db$')
+    versions = [entry for entry in os.listdir(deploy_dir) if pattern.match(entry) and entry != current_file]
+    versions.sort(key=lambda entry: os.path.getmtime(os.path.join(deploy_dir, entry)), reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        print(f"Removing old database version {entry}")
+        os.remove(os.path.join(deploy_dir, entry))
+        snapshot_path = snapshot_file_path(os.path.join(deploy_dir, entry))
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+# ----------------------------
+# Main Execution
+# ----------------------------
+
+if __name__ == "__main__":
+    publish_database(DATABASE_PATH, DEPLOY_DIR)
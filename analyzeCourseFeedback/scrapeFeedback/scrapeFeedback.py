@@ -1,4 +1,6 @@
+import os
 import sqlite3
+import sys
 import time
 import pickle
 import re
@@ -11,6 +13,10 @@ from selenium.webdriver.chrome.options import Options
 from imageProcessor import process_image
 from webdriver_manager.chrome import ChromeDriverManager
 
+# schema_migrations.py lives with the backend, which checks the same schema version
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'courseFeedBackExtensionProduction'))
+from schema_migrations import migrate  # noqa: E402
+
 # Number of parallel workers (I pushed 10 one time but you could probably go even higher. This speeds things up significantly)
 NUM_WORKERS = 12
 
@@ -558,6 +564,17 @@ def worker(worker_id, driver, url_list):
 
 
 def main():
+    # Bring the feedback database up to the current schema (tables, columns, indexes) before scraping into it
+    conn = sqlite3.connect('../course_feedback.db', timeout=30)
+    try:
+        for name in migrate(conn):
+            print(f"Applied schema migration: {name}")
+    except sqlite3.Error as e:
+        print(f"Could not migrate course_feedback.db: {e}")
+        return
+    finally:
+        conn.close()
+
     # Create driver pool
     print(f"Creating {NUM_WORKERS} WebDriver instances...")
     drivers = []
@@ -0,0 +1,56 @@
+"""
+Concurrency benchmark: the WSGI Flask app against the ASGI entry point.
+
+Starts both backends as local servers on the same database, then fires the same
+search-page payloads at each from a pool of client threads and reports throughput and
+latency. The WSGI side runs Flask's threaded server; the ASGI side runs uvicorn (one
+process, the asgi_app thread pool). Needs `pip install uvicorn`. For other targets and
+saved results, see load_test.py.
+
+Usage:
+    python benchmarks/bench_asgi.py path/to/course_feedback.db [--concurrency 32] [--requests 2000]
+"""
+import argparse
+import sys
+
+from load_test import generate_payloads, http_sender, run_load, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path')
+    parser.add_argument('--rows', type=int, default=50, help='courses per search page')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32, help='client threads')
+    parser.add_argument('--port', type=int, default=8765, help='WSGI port; ASGI uses port + 1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        sys.exit("uvicorn is not installed (pip install uvicorn).")
+
+    payloads = generate_payloads(args.db_path, args.requests, args.rows, args.rows, repeat_fraction=0, seed=args.seed)
+    servers = (
+        ('wsgi', [sys.executable, '-m', 'flask', '--app', 'flask_app', 'run', '--port', str(args.port)], args.port),
+        ('asgi', [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', str(args.port + 1), '--log-level', 'warning'], args.port + 1),
+    )
+
+    print(f"{args.requests} requests x {args.rows} rows, {args.concurrency} concurrent clients")
+    print(f"{'server':<8} {'req/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, command, port in servers:
+        process = start_server(command, port, args.db_path)
+        try:
+            make_sender = lambda: http_sender('127.0.0.1', port)  # noqa: E731
+            run_load(make_sender, payloads[:args.concurrency], args.concurrency)  # load the snapshot and warm up
+            result = run_load(make_sender, payloads, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:<8} {result['requests_per_second']:>9.1f} {result['mean_ms']:>9.2f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
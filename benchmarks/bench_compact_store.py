@@ -0,0 +1,109 @@
+"""
+Memory benchmark for the snapshot's lookup tables: plain dicts vs compact_store.
+
+Loads the same course_feedback.db twice with feedback_snapshot.load_snapshot, once as
+dicts of tuples and once as compact_store tables, and reports the memory each set of
+tables holds (measured with tracemalloc, so it's what the worker actually allocates),
+the load time and the cost of a lookup. Given a versioned database from
+publish_database.py, the snapshot file next to it is mapped and measured too (its arrays
+live in the shared page cache, not the worker's heap). Every key is checked to return the
+same value from each.
+
+Usage:
+    python benchmarks/bench_compact_store.py path/to/course_feedback.db [--lookups 200000]
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from feedback_snapshot import FeedbackLookups, data_version, load_snapshot  # noqa: E402
+from snapshot_file import map_snapshot_file, snapshot_file_path  # noqa: E402
+
+TABLES = ['course_stats', 'professor_ids', 'professor_ratings', 'professor_course_stats', 'course_aliases']
+
+
+def measure_load(load):
+    """Call load(), returning (its lookups, bytes still allocated, peak bytes, seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    lookups = load()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lookups, current, peak, seconds
+
+
+def check_equal(plain, compact):
+    for name in TABLES:
+        plain_table, compact_table = getattr(plain, name), getattr(compact, name)
+        if plain_table is None or compact_table is None:
+            if plain_table is not compact_table:
+                sys.exit(f"{name}: present in only one snapshot")
+            continue
+        if len(plain_table) != len(compact_table):
+            sys.exit(f"{name}: {len(plain_table)} dict entries vs {len(compact_table)} compact entries")
+        for key, value in plain_table.items():
+            if compact_table.get(key) != value:
+                sys.exit(f"{name}: {key!r} -> {value!r} in the dict but {compact_table.get(key)!r} compact")
+
+
+def time_lookups(lookups, keys):
+    """Mean ns per .get over keys, which are (table name, key) pairs."""
+    tables = {name: getattr(lookups, name) for name in TABLES}
+    start = time.perf_counter()
+    for name, key in keys:
+        tables[name].get(key)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path')
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    plain, plain_bytes, plain_peak, plain_seconds = measure_load(lambda: load_snapshot(args.db_path, compact=False))
+    results = [('dict', plain, plain_bytes, plain_peak, plain_seconds)]
+    results.append(('compact',) + measure_load(lambda: load_snapshot(args.db_path, compact=True)))
+
+    def load_mapped():
+        tables = map_snapshot_file(snapshot_file_path(args.db_path), data_version(args.db_path))
+        return FeedbackLookups(**tables) if tables is not None else None
+
+    mapped = measure_load(load_mapped)
+    if mapped[0] is not None:
+        results.append(('mapped',) + mapped)
+
+    for _, lookups, _, _, _ in results[1:]:
+        check_equal(plain, lookups)
+
+    # Half hits, half misses (a course number past the end of each hit's department)
+    rng = random.Random(args.seed)
+    population = [(name, key) for name in TABLES if getattr(plain, name) for key in getattr(plain, name)]
+    keys = []
+    for name, key in rng.choices(population, k=args.lookups):
+        keys.append((name, key))
+        keys.append((name, key[:-1] + (10 ** 7,) if isinstance(key, tuple) else 10 ** 9))
+
+    entries = sum(len(getattr(plain, name) or ()) for name in TABLES)
+    print(f"{entries} entries: " + ', '.join(f"{name} {len(getattr(plain, name) or ())}" for name in TABLES))
+    print(f"{'store':<8} {'MiB':>8} {'B/entry':>8} {'peak MiB':>9} {'load s':>7} {'ns/get':>7}")
+    for name, lookups, size, peak, seconds in results:
+        ns = statistics.median(time_lookups(lookups, keys) for _ in range(args.repeat))
+        print(f"{name:<8} {size / 2 ** 20:>8.2f} {size / max(entries, 1):>8.0f} {peak / 2 ** 20:>9.2f} {seconds:>7.2f} {ns:>7.0f}")
+    print(f"compact tables hold {results[1][2] / max(plain_bytes, 1):.1%} of the dicts' memory")
+
+
+if __name__ == '__main__':
+    main()
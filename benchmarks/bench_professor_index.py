@@ -0,0 +1,116 @@
+"""
+Micro-benchmark for matching professor rows to (last name, department) keys.
+
+The old resolver rescanned the whole result set for every (last name, department)
+candidate. index_professors in flask_app.py builds a (last_name, dept) -> id index in
+one pass instead. Pages are drawn with many co-taught and cross-listed sections, which
+is where the old loop was slowest. Both approaches are checked to resolve every
+instructor to the same professor.
+
+Usage:
+    python benchmarks/bench_professor_index.py path/to/course_feedback.db [--rows 200] [--instructors 3] [--listings 3]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from flask_app import find_professor_id, index_professors, json_keys  # noqa: E402
+
+
+def legacy_match(rows, professors):
+    """The old nested loop, kept here for comparison."""
+    professor_ids = {}
+    professor_ratings = {}
+    department_order = {}
+    for last_name, departments in professors:
+        department_order.setdefault((last_name, tuple(departments)), departments)
+
+    for (last_name, _), departments in department_order.items():
+        for dept in departments:
+            for prof_id, db_last_name, db_dept, rating in rows:
+                if db_last_name == last_name and db_dept == dept:
+                    professor_ids[(last_name, dept)] = prof_id
+                    professor_ratings[prof_id] = rating
+                    break
+            if (last_name, dept) in professor_ids:
+                break
+    return professor_ids, professor_ratings
+
+
+def sample_pages(conn, rows, instructors, listings, pages, seed):
+    """Draw pages of (last_name, [departments]) keys plus the professor rows they match."""
+    professors = conn.execute("SELECT last_name, dept FROM professors").fetchall()
+    departments = sorted({dept for _, dept in professors})
+    if not professors:
+        sys.exit("The database has no professors to sample from.")
+
+    rng = random.Random(seed)
+    sampled = []
+    for _ in range(pages):
+        keys = []
+        for _ in range(rows):
+            last_name, dept = rng.choice(professors)
+            row_departments = [dept] + rng.sample(departments, min(listings, len(departments)))
+            rng.shuffle(row_departments)
+            keys.append((last_name, row_departments))
+            for _ in range(instructors - 1):
+                keys.append((rng.choice(professors)[0], row_departments))
+        lookup_keys = list(dict.fromkeys((name, dept) for name, depts in keys for dept in depts))
+        matched = conn.execute("""
+            WITH keys AS (
+                SELECT json_extract(value, '$[0]') AS last_name, json_extract(value, '$[1]') AS dept
+                FROM json_each(?)
+            )
+            SELECT p.id, p.last_name, p.dept, p.avg_professor_rating
+            FROM keys
+            CROSS JOIN professors p ON p.last_name = keys.last_name AND p.dept = keys.dept
+            ORDER BY p.id
+        """, (json_keys(lookup_keys),)).fetchall()
+        sampled.append((keys, matched))
+    return sampled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path')
+    parser.add_argument('--rows', type=int, default=200, help='sections per page')
+    parser.add_argument('--instructors', type=int, default=3, help='instructors per section')
+    parser.add_argument('--listings', type=int, default=3, help='cross-listings per section')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    pages = sample_pages(conn, args.rows, args.instructors, args.listings, args.pages, args.seed)
+    conn.close()
+
+    timings = {'legacy': [], 'indexed': []}
+    for keys, matched in pages:
+        start = time.perf_counter()
+        legacy_ids, _ = legacy_match(matched, keys)
+        timings['legacy'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        indexed_ids = index_professors([(prof_id, name, dept) for prof_id, name, dept, _ in matched])
+        timings['indexed'].append((time.perf_counter() - start) * 1000)
+
+        for name, departments in keys:
+            if find_professor_id(legacy_ids, name, departments) != find_professor_id(indexed_ids, name, departments):
+                sys.exit(f"Mismatch for {name} in {departments}")
+
+    print(f"{args.pages} pages x {args.rows} sections, {args.instructors} instructors and "
+          f"{args.listings} cross-listings each; {statistics.mean(len(m) for _, m in pages):.0f} matched rows per page")
+    print(f"{'matcher':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, values in timings.items():
+        values.sort()
+        print(f"{name:<10} {statistics.mean(values):>9.3f} {values[len(values) // 2]:>9.3f} {values[int(len(values) * 0.95)]:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
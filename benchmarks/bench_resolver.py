@@ -0,0 +1,135 @@
+"""
+Micro-benchmark for the bulk SQL resolvers used by /get-course-feedback.
+
+Compares the old per-field lookups (separate rating and hours queries, then a separate
+professor rating query) against the fused resolvers in flask_app.py, and reports the
+number of SQL statements and the latency per simulated search page.
+
+Usage:
+    python benchmarks/bench_resolver.py path/to/course_feedback.db [--rows 50] [--pages 200]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from flask_app import json_keys, resolve_courses, resolve_professor_courses, resolve_professors  # noqa: E402
+from name_keys import lookup_names  # noqa: E402
+
+
+def legacy_lookups(cursor, course_keys, professor_keys, professor_course_ids):
+    """The pre-fusion query sequence: one query per field."""
+    course_query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS dept, json_extract(value, '$[1]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT c.dept, c.course_id, c.{column}
+        FROM keys
+        CROSS JOIN courses c ON c.dept = keys.dept AND c.course_id = keys.course_id
+    """
+    for column in ('avg_course_rating', 'avg_course_hours'):
+        cursor.execute(course_query.format(column=column), (json_keys(course_keys),)).fetchall()
+
+    lookup_keys = [(names[0], dept) for names, departments in professor_keys for dept in departments]
+    rows = cursor.execute("""
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS last_name, json_extract(value, '$[1]') AS dept
+            FROM json_each(?)
+        )
+        SELECT p.id FROM keys CROSS JOIN professors p ON p.last_name = keys.last_name AND p.dept = keys.dept
+    """, (json_keys(lookup_keys),)).fetchall()
+    cursor.execute(
+        "SELECT id, avg_professor_rating FROM professors WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps([row[0] for row in rows]),)
+    ).fetchall()
+
+    professor_course_query = """
+        WITH keys AS (
+            SELECT
+                json_extract(value, '$[0]') AS professor_id,
+                json_extract(value, '$[1]') AS dept,
+                json_extract(value, '$[2]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT cp.professor_id, c.dept, c.course_id, cp.{column}
+        FROM keys
+        CROSS JOIN courses c ON c.dept = keys.dept AND c.course_id = keys.course_id
+        JOIN courses_professors cp ON cp.course_id = c.id AND cp.professor_id = keys.professor_id
+    """
+    for column in ('avg_prof_course_rating', 'avg_prof_course_hours'):
+        cursor.execute(professor_course_query.format(column=column), (json_keys(professor_course_ids),)).fetchall()
+
+
+def fused_lookups(cursor, course_keys, professor_keys, professor_course_ids):
+    """What query_lookups runs: courses with their aliases, professors with their ratings, professor-courses."""
+    resolve_courses(cursor, course_keys)
+    resolve_professors(cursor, professor_keys)
+    resolve_professor_courses(cursor, professor_course_ids)
+
+
+def sample_pages(conn, rows, pages, seed):
+    """Draw search pages of existing (dept, course_id, professor) combinations."""
+    offerings = conn.execute("""
+        SELECT c.dept, c.course_id, p.id, p.last_name
+        FROM courses_professors cp
+        JOIN courses c ON cp.course_id = c.id
+        JOIN professors p ON cp.professor_id = p.id
+    """).fetchall()
+    if not offerings:
+        sys.exit("The database has no courses_professors rows to sample from.")
+
+    rng = random.Random(seed)
+    sampled = []
+    for _ in range(pages):
+        page = [rng.choice(offerings) for _ in range(rows)]
+        course_keys = list({(dept, course_id) for dept, course_id, _, _ in page})
+        professor_keys = [(lookup_names(last_name), [dept]) for dept, _, _, last_name in page]
+        professor_course_ids = list({(prof_id, dept, course_id) for dept, course_id, prof_id, _ in page})
+        sampled.append((course_keys, professor_keys, professor_course_ids))
+    return sampled
+
+
+def run(conn, lookups, pages):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    cursor = conn.cursor()
+    timings = []
+    for course_keys, professor_keys, professor_course_ids in pages:
+        start = time.perf_counter()
+        lookups(cursor, course_keys, professor_keys, professor_course_ids)
+        timings.append((time.perf_counter() - start) * 1000)
+    conn.set_trace_callback(None)
+    return len(statements) / len(pages), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path')
+    parser.add_argument('--rows', type=int, default=50, help='courses per simulated search page')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    pages = sample_pages(conn, args.rows, args.pages, args.seed)
+
+    print(f"{args.pages} pages x {args.rows} rows against {args.db_path}")
+    print(f"{'resolver':<10} {'queries/page':>13} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, lookups in (('legacy', legacy_lookups), ('fused', fused_lookups)):
+        run(conn, lookups, pages[:5])  # warm the page cache and statement cache
+        queries, timings = run(conn, lookups, pages)
+        timings.sort()
+        print(f"{name:<10} {queries:>13.1f} {statistics.mean(timings):>9.3f} "
+              f"{timings[len(timings) // 2]:>9.3f} {timings[int(len(timings) * 0.95)]:>9.3f}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
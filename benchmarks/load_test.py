@@ -0,0 +1,288 @@
+"""
+Load test for /get-course-feedback with payloads shaped like the extension's.
+
+Payloads mirror what scrapeCourseData() in courseScrape.js sends: 10-200 rows per page,
+comma-separated instructor strings (sometimes several instructors, sometimes TBA),
+otherListings split on commas exactly like the browser does (so [''] when there are
+none and a leading space on every listing after the first), plus courses the database
+doesn't know and the odd malformed courseId. Some requests re-send an earlier page,
+like the extension does whenever the results re-render.
+
+Targets:
+    test-client  Flask's test client in this process (no HTTP, no network)
+    wsgi         flask_app under Flask's threaded server, started for the run
+    asgi         asgi_app under uvicorn, started for the run (pip install uvicorn)
+    --url URL    an already running server, e.g. http://127.0.0.1:5000
+
+Results (p50/p95/p99 latency, req/s, errors, SQL statements per request) are printed
+and saved as JSON so runs can be compared.
+
+Usage:
+    python benchmarks/load_test.py path/to/course_feedback.db [--target test-client wsgi] [--concurrency 16]
+        [--requests 1000] [--output results.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def load_offerings(db_path, pool_size):
+    """
+    Read up to pool_size (dept, course_id, [last names], [cross-listings]) offerings.
+
+    Cross-listings are the other courses sharing the same feedback url.
+    """
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT c.id, c.dept, c.course_id, c.url, p.last_name
+        FROM courses c
+        JOIN courses_professors cp ON cp.course_id = c.id
+        JOIN professors p ON cp.professor_id = p.id
+        WHERE c.course_id IS NOT NULL AND c.id IN (
+            SELECT course_id FROM courses_professors ORDER BY id LIMIT ?
+        )
+    """, (pool_size,)).fetchall()
+    if not rows:
+        sys.exit("The database has no courses_professors rows to sample from.")
+
+    offerings = {}
+    for course_row_id, dept, course_id, url, last_name in rows:
+        offering = offerings.setdefault(course_row_id, (dept, int(course_id), url, []))
+        if last_name not in offering[3]:
+            offering[3].append(last_name)
+
+    listings_by_url = {}
+    urls = sorted({url for _, _, url, _ in offerings.values() if url})
+    for url, dept, course_id in conn.execute("""
+        SELECT url, dept, course_id FROM courses
+        WHERE course_id IS NOT NULL AND url IN (SELECT value FROM json_each(?))
+    """, (json.dumps(urls),)):
+        listings_by_url.setdefault(url, set()).add(f"{dept} {int(course_id)}")
+
+    departments = sorted({dept for dept, _, _, _ in offerings.values()})
+    surnames = sorted({name for _, _, _, names in offerings.values() for name in names})
+    conn.close()
+
+    result = []
+    for dept, course_id, url, names in offerings.values():
+        own = f"{dept} {course_id}"
+        result.append((dept, course_id, names, sorted(listings_by_url.get(url, set()) - {own})))
+    return result, departments, surnames
+
+
+def make_row(rng, offerings, departments, surnames):
+    """One search-result row as scrapeCourseData() builds it."""
+    roll = rng.random()
+    if roll < 0.01:
+        # Malformed course number text
+        return {'courseTitle': 'Independent Study', 'courseId': rng.choice(departments), 'instructor': '', 'otherListings': ['']}
+    if roll < 0.06:
+        # A course with no feedback yet
+        dept = rng.choice(departments)
+        course_id = rng.randint(10000, 99999)
+        return {'courseTitle': 'New Course', 'courseId': f"{dept} {course_id}", 'instructor': rng.choice(surnames), 'otherListings': ['']}
+
+    dept, course_id, names, listings = rng.choice(offerings)
+    instructors = list(names[:rng.choice((1, 1, 1, 2, 3))])
+    if rng.random() < 0.1:
+        instructors.append(rng.choice(surnames))  # an instructor who never taught it before
+    if rng.random() < 0.03:
+        instructors = ['TBA']
+    return {
+        'courseTitle': f"{dept} course {course_id}",
+        'courseId': f"{dept} {course_id}",
+        'instructor': ', '.join(instructors),
+        # JS: otherListings.split(',') on the notes text
+        'otherListings': ', '.join(listings).split(','),
+    }
+
+
+def generate_payloads(db_path, count, min_rows=10, max_rows=200, repeat_fraction=0.2, pool_size=100000, seed=0):
+    """Build count request bodies (JSON bytes) drawn from the database."""
+    offerings, departments, surnames = load_offerings(db_path, pool_size)
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        if payloads and rng.random() < repeat_fraction:
+            payloads.append(rng.choice(payloads))
+            continue
+        page = [make_row(rng, offerings, departments, surnames) for _ in range(rng.randint(min_rows, max_rows))]
+        payloads.append(json.dumps(page).encode('utf-8'))
+    return payloads
+
+
+def start_server(command, port, db_path):
+    """Start a backend on port and wait until it answers."""
+    env = dict(os.environ, COURSE_FEEDBACK_DB_PATH=os.path.abspath(db_path))
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited early: {' '.join(command)}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    sys.exit(f"Server did not start: {' '.join(command)}")
+
+
+def http_sender(host, port):
+    """A per-thread send(body) -> (status, headers) over one keep-alive connection."""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+
+    def send(body):
+        nonlocal conn
+        try:
+            conn.request('POST', '/get-course-feedback', body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            return response.status, response.headers
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            return None, {}
+    return send
+
+
+def client_sender():
+    """A per-thread send(body) -> (status, headers) through Flask's test client."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from flask_app import app
+    client = app.test_client()
+
+    def send(body):
+        response = client.post('/get-course-feedback', data=body, content_type='application/json')
+        return response.status_code, response.headers
+    return send
+
+
+def run_load(make_sender, payloads, concurrency):
+    """
+    Send every payload from concurrency threads, each with its own sender.
+
+    Returns:
+        dict: Latency percentiles (ms), throughput and error counts for the run.
+    """
+    def worker(chunk):
+        send = make_sender()
+        samples = []
+        for body in chunk:
+            start = time.perf_counter()
+            status, headers = send(body)
+            samples.append(((time.perf_counter() - start) * 1000, status, headers.get('X-SQL-Statements')))
+        return samples
+
+    chunks = [payloads[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [sample for chunk_samples in pool.map(worker, chunks) for sample in chunk_samples]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _, _ in samples)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    statements = [int(count) for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'seconds': elapsed,
+        'requests_per_second': len(samples) / elapsed,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[int(len(latencies) * 0.95)],
+        'p99_ms': latencies[int(len(latencies) * 0.99)],
+        'max_ms': latencies[-1],
+        'errors': len(samples) - statuses.get('200', 0),
+        'statuses': statuses,
+        'sql_statements_per_request': statistics.mean(statements) if statements else None,
+    }
+
+
+def run_target(target, args, payloads):
+    warmup = payloads[:args.concurrency]
+    if target == 'test-client':
+        os.environ['COURSE_FEEDBACK_DB_PATH'] = os.path.abspath(args.db_path)
+        run_load(client_sender, warmup, args.concurrency)
+        return run_load(client_sender, payloads, args.concurrency)
+
+    if target.startswith('http'):
+        url = urlsplit(target)
+        make_sender = lambda: http_sender(url.hostname, url.port or 80)  # noqa: E731
+        run_load(make_sender, warmup, args.concurrency)
+        return run_load(make_sender, payloads, args.concurrency)
+
+    if target == 'wsgi':
+        command = [sys.executable, '-m', 'flask', '--app', 'flask_app', 'run', '--port', str(args.port)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', str(args.port), '--log-level', 'warning']
+    process = start_server(command, args.port, args.db_path)
+    try:
+        make_sender = lambda: http_sender('127.0.0.1', args.port)  # noqa: E731
+        run_load(make_sender, warmup, args.concurrency)
+        return run_load(make_sender, payloads, args.concurrency)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db_path', help='database to draw payloads from (and to serve, for started targets)')
+    parser.add_argument('--target', nargs='+', choices=['test-client', 'wsgi', 'asgi'], default=['test-client'])
+    parser.add_argument('--url', help='also test an already running server at this base url')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--min-rows', type=int, default=10)
+    parser.add_argument('--max-rows', type=int, default=200)
+    parser.add_argument('--repeat-fraction', type=float, default=0.2, help='share of requests re-sending an earlier page')
+    parser.add_argument('--port', type=int, default=8765, help='port for started servers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file (default benchmarks/results/load_test-<time>.json)')
+    args = parser.parse_args()
+
+    payloads = generate_payloads(args.db_path, args.requests, args.min_rows, args.max_rows, args.repeat_fraction, seed=args.seed)
+    targets = list(args.target) + ([args.url] if args.url else [])
+
+    print(f"{args.requests} requests of {args.min_rows}-{args.max_rows} rows, {args.concurrency} concurrent clients")
+    print(f"{'target':<24} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'sql/req':>8}")
+    results = {}
+    for target in targets:
+        result = results[target] = run_target(target, args, payloads)
+        sql = '-' if result['sql_statements_per_request'] is None else f"{result['sql_statements_per_request']:.1f}"
+        print(f"{target:<24} {result['requests_per_second']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['errors']:>7} {sql:>8}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'db_path': os.path.abspath(args.db_path),
+            'config': {key: value for key, value in vars(args).items() if key not in ('db_path', 'output')},
+            'results': results,
+        }, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
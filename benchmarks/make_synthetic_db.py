@@ -0,0 +1,307 @@
+"""
+Generate synthetic course_feedback.db, all_course_ids.db and course_urls.db files.
+
+The tables match what the scrapers create, so every backend, aggregation and scraper
+benchmark can run offline and at sizes beyond the real data. The distributions follow
+the real ones:
+
+- department sizes fall off like the real catalog (a few huge, a long tail)
+- each course is offered several quarters, usually by the same instructors
+- about 15% of courses are cross-listed in one or two other departments; the listings
+  share one feedback url in course_urls.db and only the primary listing has feedback
+  rows, like the scraper stores them
+- common last names repeat across (and within) departments; some are multi-part or
+  accented ("De La Cruz", "Müller")
+- most sections have one instructor, some two or three
+- a few rating columns are NULL and the hour buckets are percentages like the scraper's
+
+--rows is the number of rows in the courses table (one per course offering with
+feedback); the other tables scale with it. Averages are not filled in: run
+analyzeCourseFeedback/calculate_averages.py in the output directory, or pass --averages
+(which does the same, and takes a long time on big databases).
+
+Usage:
+    python benchmarks/make_synthetic_db.py out_dir [--rows 100000] [--seed 0] [--averages]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+CALCULATE_AVERAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analyzeCourseFeedback', 'calculate_averages.py')
+
+# (program page, course code) pairs as scrape_courses.py records them, largest first
+PROGRAMS = [
+    ('English Language and Literature', 'ENGL'), ('Art History', 'ARTH'), ('Near Eastern Languages and Civilizations', 'NEHC'),
+    ('Anthropology', 'ANTH'), ('East Asian Languages and Civilizations', 'EALC'), ('Philosophy', 'PHIL'),
+    ('Romance Languages and Literatures', 'FREN'), ('Classical Studies', 'CLCV'), ('History', 'HIST'),
+    ('Political Science', 'PLSC'), ('Comparative Literature', 'CMLT'), ('Media Arts and Design', 'MADD'),
+    ('Gender and Sexuality Studies', 'GNSE'), ('Russian and East European Studies', 'REES'), ('Visual Arts', 'ARTV'),
+    ('Religious Studies', 'RLST'), ('South Asian Languages and Civilizations', 'SALC'), ('Race, Diaspora, and Indigeneity', 'RDIN'),
+    ('Public Policy Studies', 'PBPL'), ('Economics', 'ECON'), ('Comparative Human Development', 'CHDV'),
+    ('Environment, Geography, and Urbanization', 'CEGU'), ('Global Studies', 'GLST'), ('Psychology', 'PSYC'),
+    ('Law, Letters, and Society', 'LLSO'), ('Architectural Studies', 'ARCH'), ('Fundamentals: Issues and Texts', 'FNDL'),
+    ('Biological Sciences', 'BIOS'), ('Creative Writing', 'CRWR'), ('History, Philosophy, and Social Studies of Science and Medicine', 'HIPS'),
+    ('Environmental and Urban Studies', 'ENST'), ('Cinema and Media Studies', 'CMST'), ('Human Rights', 'HMRT'),
+    ('Music', 'MUSI'), ('Latin American and Caribbean Studies', 'LACS'), ('socialsciences/', 'SOSC'),
+    ('Theater and Performance Studies', 'TAPS'), ('Computer Science', 'CMSC'), ('Linguistics', 'LING'),
+    ('Sociology', 'SOCI'), ('Molecular Engineering', 'MENG'), ('Medieval Studies', 'MDVL'), ('Jewish Studies', 'JWSC'),
+    ('Chemistry', 'CHEM'), ('Mathematics', 'MATH'), ('Neuroscience', 'NSCI'), ('Germanic Studies', 'GRMN'),
+    ('Geophysical Sciences', 'GEOS'), ('Astrophysics', 'ASTR'), ('Democracy Studies', 'DEMS'), ('Statistics', 'STAT'),
+    ('Cognitive Science', 'COGS'), ('humanities/', 'HUMA'), ('physicalsciences/', 'PHSC'), ('Data Science', 'DATA'),
+    ('Physics', 'PHYS'), ('Computational Social Science', 'MACS'), ('Geographic Information Science', 'GISC'),
+    ('Yiddish Studies', 'YDDH'), ('Environmental Science', 'ENSC'), ('Norwegian Studies', 'NORW'), ('Archaeology', 'ARKE'),
+]
+
+SURNAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores',
+    'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell', 'Mitchell', 'Carter', 'Roberts',
+    'Chen', 'Wang', 'Li', 'Zhang', 'Liu', 'Kim', 'Park', 'Patel', 'Shah', 'Singh',
+    'Cohen', 'Levi', 'Friedman', 'Schwartz', 'Novak', 'Kowalski', 'Ivanov', 'Rossi', 'Bianchi', 'Dubois',
+    'Müller', 'Schäfer', 'García', 'Núñez', 'Peña', 'Søndergaard', 'Björk', 'Özdemir', 'Nakamura', 'Tanaka',
+    'De La Cruz', 'Van Buren', 'Von Hagen', 'Del Toro', 'Da Silva', 'Al-Hassan', 'El Amrani', "O'Connor", 'McAllister', 'St. John',
+]
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Wei', 'Priya',
+    'Ana', 'José', 'Chloé', 'Søren', 'Aisha', 'Hiroshi', 'Olga', 'Mateo', 'Fatima', 'Noah',
+]
+TERMS = ['Autumn', 'Winter', 'Spring', 'Summer']
+TERM_WEIGHTS = [10, 10, 10, 1]
+COVID_QUARTERS = {'Winter 2019', 'Spring 2020', 'Summer 2020', 'Autumn 2020', 'Winter 2021', 'Spring 2021'}
+QUARTERS = [f"{term} {year}" for year in range(2010, 2026) for term in TERMS if f"{term} {year}" not in COVID_QUARTERS]
+QUARTER_WEIGHTS = [TERM_WEIGHTS[TERMS.index(quarter.split()[0])] for quarter in QUARTERS]
+
+RATING_COLUMNS = [
+    'challenge_intellect', 'purpose', 'standards', 'feedback', 'fairness', 'respect', 'excellence',
+    'organization', 'challenge', 'available', 'inclusive', 'significant',
+]
+HOUR_COLUMNS = [
+    'less_five', 'five_to_ten', 'ten_to_fifteen', 'fifteen_to_twenty', 'twenty_to_twenty_five',
+    'twenty_five_to_thirty', 'more_thirty',
+]
+BATCH_SIZE = 50000
+
+
+def create_feedback_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(f"""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dept TEXT,
+            quarter TEXT,
+            course_id INTEGER,
+            {', '.join(f'{column} REAL' for column in RATING_COLUMNS + HOUR_COLUMNS)},
+            url TEXT
+        );
+        CREATE TABLE professors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dept TEXT,
+            first_name TEXT,
+            last_name TEXT
+        );
+        CREATE TABLE courses_professors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER,
+            professor_id INTEGER
+        );
+    """)
+    return conn
+
+
+def create_course_ids_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department TEXT,
+            course_id TEXT
+        );
+        CREATE UNIQUE INDEX idx_dept_course ON courses(department, course_id);
+    """)
+    return conn
+
+
+def create_course_urls_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE course_urls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id TEXT,
+            department TEXT,
+            url TEXT
+        );
+    """)
+    return conn
+
+
+def zipf_weights(count, exponent):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class Generator:
+    """Draws the synthetic catalog, instructors and offerings from one seeded RNG."""
+
+    def __init__(self, rows, seed):
+        self.rng = random.Random(seed)
+        self.rows = rows
+        self.codes = [code for _, code in PROGRAMS]
+        self.code_weights = zipf_weights(len(self.codes), 0.8)
+        self.surname_weights = zipf_weights(len(SURNAMES), 0.9)
+        self.next_number = {code: 10000 for code in self.codes}
+        self.professors = {}  # (first_name, last_name, dept) -> id, like insert_professors dedups
+        self.faculty = {}  # dept -> [(first_name, last_name)]
+
+    def course_number(self, code):
+        """A new, unused catalog number in the department."""
+        number = self.next_number[code] + self.rng.choice((10, 10, 10, 100, 1000)) // 10 * self.rng.randint(1, 3)
+        if number > 99999:
+            number = self.rng.randint(10000, 99999)  # only reached at extreme scales; duplicates are harmless
+        self.next_number[code] = number
+        return number
+
+    def instructor(self, dept):
+        """An instructor who teaches in dept, usually a recurring one."""
+        faculty = self.faculty.setdefault(dept, [])
+        if not faculty or self.rng.random() < 0.08:
+            name = (self.rng.choice(FIRST_NAMES), self.rng.choices(SURNAMES, self.surname_weights)[0])
+            faculty.append(name)
+            return name
+        return self.rng.choice(faculty)
+
+    def professor_id(self, professor, dept, professor_rows):
+        key = (professor[0], professor[1], dept)
+        professor_id = self.professors.get(key)
+        if professor_id is None:
+            professor_id = self.professors[key] = len(self.professors) + 1
+            professor_rows.append((professor_id, dept, professor[0], professor[1]))
+        return professor_id
+
+    def ratings(self, quality):
+        values = []
+        for index in range(len(RATING_COLUMNS)):
+            if index >= 7 and self.rng.random() < 0.05:
+                values.append(None)  # instructor questions missing from some reports
+            else:
+                values.append(round(min(5.0, max(1.0, self.rng.gauss(quality, 0.35))), 2))
+        return values
+
+    def hours(self, workload):
+        """Percentages per hour bucket around the course's typical workload (a bucket index)."""
+        weights = [max(0.0, 1.5 - abs(index - workload)) + self.rng.random() * 0.2 for index in range(len(HOUR_COLUMNS))]
+        total = sum(weights)
+        values = [round(weight / total * 100, 2) for weight in weights]
+        if values[-1] == 0 and self.rng.random() < 0.5:
+            values[-1] = None  # the scraper stores None when the >30 bucket is missing
+        return values
+
+    def catalog_courses(self):
+        """Yield (listings, offerings) per catalog course until --rows offerings have been produced."""
+        produced = 0
+        while produced < self.rows:
+            primary = self.rng.choices(self.codes, self.code_weights)[0]
+            listings = [(primary, self.course_number(primary))]
+            if self.rng.random() < 0.15:
+                for code in self.rng.sample(self.codes, self.rng.choice((1, 1, 2))):
+                    if code != primary:
+                        listings.append((code, self.course_number(code)))
+            offerings = min(self.rows - produced, max(1, int(self.rng.expovariate(1 / 4))))
+            produced += offerings
+            yield listings, offerings
+
+
+def generate(out_dir, rows, seed):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, name) for name in ('course_feedback.db', 'all_course_ids.db', 'course_urls.db')]
+    for path in paths:
+        if os.path.exists(path):
+            sys.exit(f"{path} already exists; pick an empty directory.")
+
+    feedback_conn = create_feedback_db(paths[0])
+    ids_conn = create_course_ids_db(paths[1])
+    urls_conn = create_course_urls_db(paths[2])
+    program_names = {}
+    for name, code in PROGRAMS:
+        program_names.setdefault(code, name)
+
+    generator = Generator(rows, seed)
+    rng = generator.rng
+    course_rows, professor_rows, course_professor_rows, course_id_rows, url_rows = [], [], [], [], []
+    course_row_id = 0
+    course_professor_id = 0
+    report_id = 100000
+
+    def flush(final=False):
+        if final or len(course_rows) >= BATCH_SIZE:
+            feedback_conn.executemany(
+                f"INSERT INTO courses (id, dept, quarter, course_id, {', '.join(RATING_COLUMNS + HOUR_COLUMNS)}, url) "
+                f"VALUES ({', '.join('?' * (len(RATING_COLUMNS) + len(HOUR_COLUMNS) + 5))})", course_rows)
+            feedback_conn.executemany("INSERT INTO professors (id, dept, first_name, last_name) VALUES (?, ?, ?, ?)", professor_rows)
+            feedback_conn.executemany("INSERT INTO courses_professors (id, course_id, professor_id) VALUES (?, ?, ?)", course_professor_rows)
+            ids_conn.executemany("INSERT OR IGNORE INTO courses (department, course_id) VALUES (?, ?)", course_id_rows)
+            urls_conn.executemany("INSERT INTO course_urls (course_id, department, url) VALUES (?, ?, ?)", url_rows)
+            for batch in (course_rows, professor_rows, course_professor_rows, course_id_rows, url_rows):
+                batch.clear()
+
+    start = time.perf_counter()
+    for listings, offerings in generator.catalog_courses():
+        dept, number = listings[0]
+        quality = min(4.9, max(2.0, rng.gauss(4.1, 0.4)))
+        workload = rng.triangular(0, 6, 1.5)
+        regulars = [generator.instructor(dept) for _ in range(rng.choices((1, 2, 3), (75, 20, 5))[0])]
+
+        for code, listing_number in listings:
+            # Catalog pages list the course under its own program and, for cross-listings, the primary's
+            for program_code in {code, dept}:
+                course_id_rows.append((program_names[program_code], f"{code}\xa0{listing_number}"))
+
+        for quarter in rng.choices(QUARTERS, QUARTER_WEIGHTS, k=offerings):
+            report_id += 1
+            url = f"https://coursefeedback.uchicago.edu/?ReportId={report_id}"
+            course_row_id += 1
+            course_rows.append([course_row_id, dept, quarter, number] + generator.ratings(quality) + generator.hours(workload) + [url])
+            for code, listing_number in listings:
+                url_rows.append((f"{code} {listing_number}", code, url))
+
+            instructors = regulars if rng.random() < 0.8 else [generator.instructor(dept) for _ in regulars]
+            for professor in dict.fromkeys(instructors):
+                course_professor_id += 1
+                course_professor_rows.append((course_professor_id, course_row_id, generator.professor_id(professor, dept, professor_rows)))
+        flush()
+    flush(final=True)
+
+    for conn in (feedback_conn, ids_conn, urls_conn):
+        conn.commit()
+        conn.close()
+    print(f"Wrote {course_row_id} course rows, {len(generator.professors)} professors and "
+          f"{course_professor_id} course-professor rows to {out_dir} in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('out_dir')
+    parser.add_argument('--rows', type=int, default=100000, help='rows in the courses table (10k to 10M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--averages', action='store_true', help='run calculate_averages.py on the result')
+    args = parser.parse_args()
+
+    generate(args.out_dir, args.rows, args.seed)
+    if args.averages:
+        # calculate_averages.py works on course_feedback.db in its working directory
+        subprocess.run([sys.executable, os.path.abspath(CALCULATE_AVERAGES)], cwd=args.out_dir, check=True)
+
+
+if __name__ == '__main__':
+    main()
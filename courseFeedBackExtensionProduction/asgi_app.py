@@ -0,0 +1,178 @@
+"""
+ASGI entry point for the feedback backend.
+
+Serves the same POST /get-course-feedback contract as flask_app.py (same JSON in and out,
+same CORS, Server-Timing and X-SQL-* headers) without holding a worker per request. The
+event loop only parses and writes HTTP; resolution runs on a bounded thread pool, where it
+is a few dict lookups against the in-memory snapshot, or the bulk SQL queries if the
+snapshot could not be loaded.
+
+Run it with any ASGI server, e.g.:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from compression import negotiate_encoding
+from flask_app import DB_PATH, data_source, encoded_feedback
+from feedback_snapshot import active_snapshot
+from metrics import begin_request_stats, end_request_stats, request_courses
+
+# Threads resolving requests. Requests beyond ASGI_MAX_PENDING (running plus queued) get a
+# 503 straight away instead of piling up behind a slow database.
+ASGI_WORKERS = int(os.environ.get('FEEDBACK_ASGI_WORKERS', '4'))
+ASGI_MAX_PENDING = int(os.environ.get('FEEDBACK_ASGI_MAX_PENDING', '256'))
+
+# A search page is a few hundred rows at most; anything far bigger is refused
+MAX_BODY_BYTES = int(os.environ.get('FEEDBACK_MAX_BODY_BYTES', str(4 * 1024 * 1024)))
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', b'Server-Timing, X-SQL-Rows, X-SQL-Statements'),
+]
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_WORKERS, thread_name_prefix='feedback')
+_pending = None  # asyncio.Semaphore, created on the server's event loop
+
+
+def resolve_feedback(data, encoding):
+    """
+    Resolve one payload on a pool thread, the same way get_course_feedback does.
+
+    Args:
+        data (list): The courses sent by the extension.
+        encoding (str): 'br', 'gzip' or None, from the request's Accept-Encoding.
+
+    Returns:
+        tuple: (JSON body bytes, extra response headers).
+    """
+    begin_request_stats()
+    try:
+        request_courses.observe(len(data))
+        body, encoding = encoded_feedback(data, data_source(), encoding)
+    finally:
+        stats = end_request_stats()
+    headers = [
+        (b'server-timing', stats.server_timing().encode('latin-1')),
+        (b'x-sql-statements', str(stats.sql_statements).encode('latin-1')),
+        (b'x-sql-rows', str(stats.sql_rows).encode('latin-1')),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+    return body, headers
+
+
+def warm_snapshot():
+    try:
+        active_snapshot(DB_PATH)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"Could not load feedback snapshot at startup: {e}")
+
+
+async def read_body(receive):
+    """The request body, or None if it is larger than MAX_BODY_BYTES."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, body=b'', content_type=b'application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ] + CORS_HEADERS + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def request_header(scope, name):
+    """A request header as a str (name in lowercase bytes), or None."""
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def get_course_feedback(scope, receive, send):
+    encoding = negotiate_encoding(request_header(scope, b'accept-encoding'))
+    body = await read_body(receive)
+    if body is None:
+        await send_response(send, 413, b'{"error": "Request body too large"}')
+        return
+    try:
+        data = json.loads(body)
+    except ValueError:
+        await send_response(send, 400, b'{"error": "Invalid JSON"}')
+        return
+
+    if _pending.locked():
+        await send_response(send, 503, b'{"error": "Server busy"}', headers=[(b'retry-after', b'1')])
+        return
+    async with _pending:
+        loop = asyncio.get_running_loop()
+        try:
+            body, headers = await loop.run_in_executor(_executor, resolve_feedback, data, encoding)
+        except (KeyError, TypeError, AttributeError) as e:
+            # Same payload errors that make the Flask app return a 500
+            logging.error(f"Could not resolve feedback request: {e!r}")
+            await send_response(send, 500, b'{"error": "Internal server error"}')
+            return
+    await send_response(send, 200, body, headers=headers)
+
+
+async def lifespan(receive, send):
+    global _pending
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _pending = asyncio.Semaphore(ASGI_MAX_PENDING)
+            await asyncio.get_running_loop().run_in_executor(_executor, warm_snapshot)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    global _pending
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    if _pending is None:
+        # Servers that skip the lifespan protocol
+        _pending = asyncio.Semaphore(ASGI_MAX_PENDING)
+
+    path, method = scope['path'], scope['method']
+    if path == '/' and method in ('GET', 'HEAD'):
+        await send_response(send, 200, b'The ASGI app is working!', content_type=b'text/plain; charset=utf-8')
+    elif path == '/get-course-feedback' and method == 'POST':
+        await get_course_feedback(scope, receive, send)
+    elif path == '/get-course-feedback' and method == 'OPTIONS':
+        # CORS preflight from the extension
+        await send_response(send, 204, content_type=b'text/plain', headers=[
+            (b'access-control-allow-methods', b'POST, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type'),
+            (b'access-control-max-age', b'86400'),
+        ])
+    else:
+        await send_response(send, 404, b'{"error": "Not found"}')
@@ -0,0 +1,381 @@
+import array
+import zlib
+from bisect import bisect_left
+
+# Read-only lookup tables for the snapshot, packed into arrays instead of dicts of tuples.
+#
+# A dict entry keyed on ('ECON', 20000) with a (rating, hours) value costs a few hundred
+# bytes once the key tuple, value tuple, ints, floats and the hash table slot are counted.
+# Here a table is one sorted array of keys packed into 64-bit ints plus one array per value
+# column, so the same entry is 8 bytes of key and 8 per value, and a lookup is a bisect.
+# Department codes are interned once per snapshot and stored as small ints.
+#
+# The tables answer the calls the resolver makes on the dicts (get, in, iteration, items,
+# len), so the snapshot can hold either; prefetch.py builds its own tables to read whole
+# departments with prefix_keys. layout() / from_layout() expose the arrays so
+# snapshot_file.py can write them out and map them back in; any sequence that indexes
+# like the arrays (e.g. a memoryview cast to the same format) works.
+
+# Field kinds
+DEPT = 'dept'      # department code, interned
+INT = 'int'        # non-negative integer (course number, professor id)
+FLOAT = 'float'    # average; None is stored as NaN
+NAME = 'name'      # normalized name key (name_keys.py), only as the first field of a CompactNameIndex key
+
+
+class DeptCodes:
+    """Department codes interned to small ints, shared by every table of one snapshot."""
+
+    def __init__(self, codes=()):
+        self.codes = []
+        self._index = {}
+        # code(dept): the code for dept, or None if no table has it
+        self.code = self._index.get
+        for dept in codes:
+            self.intern(dept)
+
+    def intern(self, dept):
+        code = self._index.get(dept)
+        if code is None:
+            code = self._index[dept] = len(self.codes)
+            self.codes.append(dept)
+        return code
+
+
+class CompactTable:
+    """
+    Mapping from DEPT/INT tuple keys to DEPT/INT or FLOAT values, stored in sorted arrays.
+
+    Each key is packed into one int as a mixed-radix number (one digit per field, the
+    radix being the number of departments or the largest value + 1), so keys sort and
+    compare as single ints. Keys and values with one field are plain values, not 1-tuples,
+    like professor_ratings' professor id -> rating. When a key appears more than once the
+    last row wins, as it would building a dict.
+    """
+
+    def __init__(self, rows, key_fields, value_fields, depts):
+        """
+        Args:
+            rows (iterable): Tuples of the key fields followed by the value fields.
+            key_fields (tuple): Field kinds of the key (DEPT or INT).
+            value_fields (tuple): Field kinds of the value, all FLOAT or all DEPT/INT.
+            depts (DeptCodes): Interned department codes for this snapshot.
+
+        Raises:
+            ValueError: An INT field is negative, or the keys don't fit in 64 bits.
+        """
+        self._depts = depts
+        self._key_fields = key_fields
+        self._value_fields = value_fields
+        self._value_type = 'd' if FLOAT in value_fields else 'q'
+        self._single_key = len(key_fields) == 1
+        width = len(key_fields)
+
+        # Read the rows into columns first; the radix of each key field is only known at the end
+        key_columns = [array.array('q') for _ in key_fields]
+        value_columns = [array.array(self._value_type) for _ in value_fields]
+        for row in rows:
+            for column, field, part in zip(key_columns, key_fields, row[:width]):
+                column.append(depts.intern(part) if field == DEPT else part)
+            for column, field, part in zip(value_columns, value_fields, row[width:]):
+                column.append(self._encode_value(field, part))
+
+        self._radices = []
+        limit = 1
+        for field, column in zip(key_fields, key_columns):
+            if field == INT and column and min(column) < 0:
+                raise ValueError("CompactTable keys must be non-negative integers")
+            radix = len(depts.codes) if field == DEPT else max(column, default=-1) + 1
+            self._radices.append(max(radix, 1))
+            limit *= self._radices[-1]
+        if limit > 2 ** 63:
+            raise ValueError("CompactTable keys do not fit in 64 bits")
+
+        packed = array.array('q', bytes(8 * len(key_columns[0])))
+        for column, radix in zip(key_columns, self._radices):
+            for index, digit in enumerate(column):
+                packed[index] = packed[index] * radix + digit
+        del key_columns
+
+        # Equal keys end up next to each other in row order; keep the last one, like a dict
+        order = sorted(range(len(packed)), key=packed.__getitem__)
+        order = [
+            index for position, index in enumerate(order)
+            if position + 1 == len(order) or packed[order[position + 1]] != packed[index]
+        ]
+        self._keys = array.array('q', (packed[index] for index in order))
+        self._value_columns = [array.array(self._value_type, (column[index] for index in order)) for column in value_columns]
+
+    @classmethod
+    def from_layout(cls, params, arrays, depts):
+        """Rebuild a table from what layout() returned, without copying the arrays."""
+        table = cls.__new__(cls)
+        table._depts = depts
+        table._key_fields = tuple(params['key_fields'])
+        table._value_fields = tuple(params['value_fields'])
+        table._radices = list(params['radices'])
+        table._value_type = 'd' if FLOAT in table._value_fields else 'q'
+        table._single_key = len(table._key_fields) == 1
+        table._keys = arrays[0]
+        table._value_columns = list(arrays[1:])
+        return table
+
+    @property
+    def depts(self):
+        return self._depts
+
+    def layout(self):
+        """
+        Returns:
+            tuple: (JSON-serializable parameters, [keys, value column, ...] arrays).
+        """
+        params = {
+            'kind': 'table',
+            'key_fields': list(self._key_fields),
+            'value_fields': list(self._value_fields),
+            'radices': self._radices,
+        }
+        return params, [self._keys] + self._value_columns
+
+    def _encode_value(self, field, part):
+        if field == FLOAT:
+            return float('nan') if part is None else part
+        return self._depts.intern(part) if field == DEPT else part
+
+    def _pack(self, key):
+        """The packed form of key, or None if no key in the table can equal it."""
+        if self._single_key:
+            return key if type(key) is int and 0 <= key < self._radices[0] else None
+        if type(key) is not tuple or len(key) != len(self._key_fields):
+            return None
+        packed = 0
+        code = self._depts.code
+        for field, radix, part in zip(self._key_fields, self._radices, key):
+            # Departments interned by a later table can have codes past this table's radix
+            digit = code(part) if field == DEPT else part
+            if type(digit) is not int or not 0 <= digit < radix:
+                return None
+            packed = packed * radix + digit
+        return packed
+
+    def _unpack(self, packed):
+        parts = []
+        for field, radix in zip(reversed(self._key_fields), reversed(self._radices)):
+            packed, digit = divmod(packed, radix)
+            parts.append(self._depts.codes[digit] if field == DEPT else digit)
+        return parts[0] if len(parts) == 1 else tuple(reversed(parts))
+
+    def _value(self, index):
+        parts = ()
+        if self._value_type == 'd':
+            for column in self._value_columns:
+                part = column[index]
+                parts += (None if part != part else part,)
+        else:
+            for field, column in zip(self._value_fields, self._value_columns):
+                part = column[index]
+                parts += (self._depts.codes[part] if field == DEPT else part,)
+        return parts[0] if len(parts) == 1 else parts
+
+    def _find(self, key):
+        packed = self._pack(key)
+        if packed is None:
+            return None
+        index = bisect_left(self._keys, packed)
+        if index == len(self._keys) or self._keys[index] != packed:
+            return None
+        return index
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return default if index is None else self._value(index)
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._value(index)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return (self._unpack(packed) for packed in self._keys)
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((self._unpack(packed), self._value(index)) for index, packed in enumerate(self._keys))
+
+    def prefix_keys(self, prefix):
+        """
+        The keys whose leading fields equal prefix, in order.
+
+        Keys sort field by field, so they are one contiguous run of the array, found with
+        two bisects; a table keyed (DEPT, INT) gives a department's keys without a scan.
+
+        Args:
+            prefix (tuple): Values for the first len(prefix) key fields.
+
+        Returns:
+            iterator: The matching keys.
+        """
+        if len(prefix) > len(self._key_fields):
+            return iter(())
+        start = 0
+        code = self._depts.code
+        for field, radix, part in zip(self._key_fields, self._radices, prefix):
+            digit = code(part) if field == DEPT else part
+            if type(digit) is not int or not 0 <= digit < radix:
+                return iter(())
+            start = start * radix + digit
+        span = 1
+        for radix in self._radices[len(prefix):]:
+            span *= radix
+        start *= span
+        low = bisect_left(self._keys, start)
+        high = bisect_left(self._keys, start + span, low)
+        return (self._unpack(self._keys[index]) for index in range(low, high))
+
+
+def name_hash(encoded_name, dept_code):
+    """Hash of a (UTF-8 name key, department code) pair, the same in every process."""
+    return zlib.crc32(dept_code.to_bytes(4, 'little'), zlib.crc32(encoded_name))
+
+
+class CompactNameIndex:
+    """
+    Mapping from (name key, dept) to a professor id, for the professor_ids table.
+
+    Name keys are strings, so entries are sorted by a CRC-32 of the key instead of the key
+    itself: the hashes are bisected and the few entries with an equal hash are checked
+    against the stored name bytes. The names are kept in one bytes blob with offsets.
+    """
+
+    def __init__(self, rows, depts):
+        """
+        Args:
+            rows (iterable): (name_key, dept, professor_id) tuples, unique on (name_key, dept)
+                like the professor_name_keys table and build_name_index.
+            depts (DeptCodes): Interned department codes for this snapshot.
+        """
+        self._depts = depts
+        entries = []
+        for name, dept, professor_id in rows:
+            dept_code = depts.intern(dept)
+            encoded = name.encode('utf-8')
+            entries.append((name_hash(encoded, dept_code), encoded, dept_code, professor_id))
+        entries.sort()
+
+        self._hashes = array.array('q')
+        self._offsets = array.array('q', [0])
+        self._dept_codes = array.array('i')
+        self._ids = array.array('q')
+        blob = bytearray()
+        for hashed, name, dept_code, professor_id in entries:
+            self._hashes.append(hashed)
+            blob += name
+            self._offsets.append(len(blob))
+            self._dept_codes.append(dept_code)
+            self._ids.append(professor_id)
+        self._blob = bytes(blob)
+
+    @classmethod
+    def from_layout(cls, params, arrays, depts):
+        """Rebuild an index from what layout() returned, without copying the arrays."""
+        index = cls.__new__(cls)
+        index._depts = depts
+        index._hashes, index._offsets, index._dept_codes, index._ids, index._blob = arrays
+        return index
+
+    @property
+    def depts(self):
+        return self._depts
+
+    def layout(self):
+        """
+        Returns:
+            tuple: (JSON-serializable parameters, [hashes, offsets, dept codes, ids, name blob]).
+        """
+        return {'kind': 'names'}, [self._hashes, self._offsets, self._dept_codes, self._ids, self._blob]
+
+    def _name(self, index):
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+    def key_at(self, index):
+        """The (name key, dept) of the index-th entry in iteration order."""
+        return str(self._name(index), 'utf-8'), self._depts.codes[self._dept_codes[index]]
+
+    def _find(self, key):
+        if not isinstance(key, tuple) or len(key) != 2:
+            return None
+        name, dept = key
+        dept_code = self._depts.code(dept)
+        if dept_code is None or not isinstance(name, str):
+            return None
+        encoded = name.encode('utf-8')
+        hashed = name_hash(encoded, dept_code)
+        index = bisect_left(self._hashes, hashed)
+        while index < len(self._hashes) and self._hashes[index] == hashed:
+            if self._dept_codes[index] == dept_code and self._name(index) == encoded:
+                return index
+            index += 1
+        return None
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return default if index is None else self._ids[index]
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._ids[index]
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        for index in range(len(self._ids)):
+            yield self.key_at(index)
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return zip(iter(self), self._ids)
+
+
+def build_table(rows, key_fields, value_fields, depts=None):
+    """
+    A lookup table over rows: compact if depts is given, otherwise a plain dict.
+
+    Args:
+        rows (iterable): Tuples of the key fields followed by the value fields.
+        key_fields (tuple): Field kinds of the key; (NAME, DEPT) builds a CompactNameIndex.
+        value_fields (tuple): Field kinds of the value.
+        depts (DeptCodes): Interned department codes shared by the snapshot's tables, or
+            None for a dict.
+
+    Returns:
+        dict, CompactTable or CompactNameIndex: Keys and values as tuples, or plain values
+        where there is one field.
+    """
+    if depts is not None:
+        if key_fields == (NAME, DEPT):
+            return CompactNameIndex(rows, depts)
+        return CompactTable(rows, key_fields, value_fields, depts)
+
+    width = len(key_fields)
+    table = {}
+    for row in rows:
+        key = row[0] if width == 1 else tuple(row[:width])
+        table[key] = row[width] if len(row) == width + 1 else tuple(row[width:])
+    return table
@@ -0,0 +1,91 @@
+import gzip
+import os
+import threading
+
+# Brotli is optional (pip install brotli); without it responses are offered as gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = int(os.environ.get('FEEDBACK_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('FEEDBACK_BROTLI_QUALITY', '5'))
+
+# Bodies smaller than this go out uncompressed; the headers would eat most of the saving
+MIN_COMPRESS_BYTES = 512
+
+# In order of preference when the client accepts several equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding, offered=SUPPORTED_ENCODINGS):
+    """
+    Pick the content coding for a response from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The request's Accept-Encoding header (may be empty).
+        offered (tuple): Codings this response can be sent in, most preferred first.
+
+    Returns:
+        str: 'br' or 'gzip', or None to send the body as is.
+    """
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in offered:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class EncodedBody:
+    """
+    A response body plus its compressed forms, each made the first time it is asked for.
+
+    Kept in the response caches, so a repeated page is compressed once per coding rather
+    than once per request.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """
+        Returns:
+            tuple: (body bytes, the coding actually used or None).
+        """
+        if encoding is None or len(self.raw) < MIN_COMPRESS_BYTES:
+            return self.raw, None
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    body = compress(self.raw, encoding)
+                    self._encoded[encoding] = body
+        return body, encoding
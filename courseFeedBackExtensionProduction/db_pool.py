@@ -0,0 +1,65 @@
+import sqlite3
+import os
+import threading
+from urllib.parse import quote
+
+# Tuning for the read-only serving connections. The database is a few hundred MB at most,
+# so mapping the whole file and keeping a generous page cache per connection is cheap.
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 16 * 1024
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+
+
+def db_signature(db_path):
+    """Cheap fingerprint of the database file used to notice when it has been replaced."""
+    stat = os.stat(db_path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def open_read_only(db_path):
+    """
+    Open a tuned, read-only connection to the feedback database.
+
+    The file is opened with immutable=1 so SQLite skips locking and change detection
+    entirely; callers must not keep the connection once the file changes (see get_connection).
+    """
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def get_connection(db_path):
+    """
+    Return this thread's pooled connection to db_path.
+
+    Connections live for the life of the worker thread so the page cache and prepared
+    statements carry over between requests. If the file on disk has changed since the
+    connection was opened, the old connection is closed and a new one opened. Connections
+    to other paths (earlier published versions) are closed too.
+    """
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+
+    signature = db_signature(db_path)
+    entry = pool.get(db_path)
+    if entry is not None:
+        conn, opened_signature = entry
+        if opened_signature == signature:
+            return conn
+        conn.close()
+
+    for path, (old_conn, _) in list(pool.items()):
+        if path != db_path:
+            old_conn.close()
+            del pool[path]
+
+    conn = open_read_only(db_path)
+    pool[db_path] = (conn, signature)
+    return conn
+
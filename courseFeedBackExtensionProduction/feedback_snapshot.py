@@ -0,0 +1,293 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from compact_store import DEPT, FLOAT, INT, NAME, DeptCodes, build_table
+from db_pool import db_signature, open_read_only
+from name_keys import build_name_index
+from schema_migrations import schema_warning
+from snapshot_file import map_snapshot_file, snapshot_file_path
+
+# The lookup tables the feedback endpoint reads from. The same shape is used for the
+# whole-database snapshot and for the per-request results of the bulk SQL queries. The
+# snapshot's tables are compact_store tables (or dicts), the per-request ones dicts.
+FeedbackLookups = namedtuple('FeedbackLookups', [
+    'course_stats',            # (dept, course_id) -> (avg_course_rating, avg_course_hours)
+    'professor_ids',           # (name_key, dept) -> professor id, see name_keys.py
+    'professor_ratings',       # professor id -> avg_professor_rating
+    'professor_course_stats',  # (professor_id, dept, course_id) -> (avg_prof_course_rating, avg_prof_course_hours)
+    'course_aliases',          # (dept, course_id) -> canonical (dept, course_id), or None without the table
+])
+
+# The data a request is served from. lookups is None when the snapshot could not be loaded
+# and the request has to query db_path directly.
+Snapshot = namedtuple('Snapshot', ['version', 'db_path', 'lookups'])
+
+# publish_database.py deploys course_feedback.<version>.db files and names the live one in
+# a pointer file next to the configured path (course_feedback.db -> course_feedback.current)
+VERSIONED_NAME = re.compile(r'\.([0-9a-f]{16})\.db$')
+
+# FEEDBACK_COMPACT_SNAPSHOT=1 holds the snapshot in compact_store's packed arrays, mapped
+# from the snapshot file when there is one: about a tenth of the memory of dicts of tuples,
+# but every lookup is a bisect, roughly 10x slower than a dict probe. Off by default, and
+# then the snapshot file is not mapped either: each worker process loads its own dicts, so
+# memory grows with the worker count. Turn it on when worker memory matters more than a
+# millisecond per search page.
+COMPACT_SNAPSHOT = os.environ.get('FEEDBACK_COMPACT_SNAPSHOT', '0') != '0'
+
+# How long to wait before retrying a published version that failed to load
+RETRY_SECONDS = 60
+
+_active = None  # Snapshot currently served; replaced as a whole, never mutated
+_active_lock = threading.Lock()
+_warming = set()  # versions being loaded in the background
+_failed = {}  # version -> time.monotonic() of the last failed load
+
+# db_path -> (file signature, content hash) so the file is only hashed when it changes
+_versions = {}
+
+# pointer path -> (file signature, database path it names)
+_pointers = {}
+
+
+# The serving tables calculate_averages.py builds, one row per lookup key
+SERVING_QUERIES = {
+    'course_stats': "SELECT dept, course_id, avg_course_rating, avg_course_hours FROM course_stats",
+    'professor_stats': "SELECT professor_id, avg_professor_rating FROM professor_stats",
+    'prof_course_stats': """
+        SELECT professor_id, dept, course_id, avg_prof_course_rating, avg_prof_course_hours FROM prof_course_stats
+    """,
+}
+
+# Databases from before the serving tables, with the averages copied onto every row
+LEGACY_QUERIES = {
+    'course_stats': """
+        SELECT dept, course_id, avg_course_rating, avg_course_hours FROM courses WHERE course_id IS NOT NULL
+    """,
+    'professor_stats': "SELECT id, avg_professor_rating FROM professors",
+    'prof_course_stats': """
+        SELECT cp.professor_id, c.dept, c.course_id, cp.avg_prof_course_rating, cp.avg_prof_course_hours
+        FROM courses_professors cp
+        JOIN courses c ON cp.course_id = c.id
+        WHERE c.course_id IS NOT NULL
+    """,
+}
+
+
+def read_stats(cursor, table):
+    """Rows of a serving table, or the same columns from the per-row averages if it's missing."""
+    try:
+        return cursor.execute(SERVING_QUERIES[table])
+    except sqlite3.OperationalError:
+        return cursor.execute(LEGACY_QUERIES[table])
+
+
+def load_snapshot(db_path, compact=COMPACT_SNAPSHOT):
+    """
+    Load every aggregate the feedback endpoint needs into memory.
+
+    The averages are computed once a quarter by calculate_averages.py, so the whole
+    database can be read at startup and every request answered from in-memory lookups.
+
+    Args:
+        db_path (str): Path to course_feedback.db.
+        compact (bool): Hold the tables in compact_store's arrays rather than dicts.
+
+    Returns:
+        FeedbackLookups: Read-only lookup tables covering the entire database.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file '{db_path}' does not exist.")
+
+    depts = DeptCodes() if compact else None
+    conn = open_read_only(db_path)
+    try:
+        # The backend only reads, so an out-of-date schema is reported rather than migrated
+        warning = schema_warning(conn)
+        if warning:
+            logging.warning(f"'{db_path}': {warning}")
+
+        cursor = conn.cursor()
+
+        course_stats = build_table(
+            ((dept, int(course_id), rating, hours) for dept, course_id, rating, hours in read_stats(cursor, 'course_stats')),
+            (DEPT, INT), (FLOAT, FLOAT), depts
+        )
+
+        professor_ratings = build_table(read_stats(cursor, 'professor_stats'), (INT,), (FLOAT,), depts)
+
+        # Normalized name keys from build_name_index.py, or built here for databases without them
+        try:
+            cursor.execute("SELECT name_key, dept, professor_id FROM professor_name_keys")
+            name_rows = cursor.fetchall()
+        except sqlite3.OperationalError:
+            cursor.execute("SELECT id, first_name, last_name, dept FROM professors")
+            name_rows = [(name_key, dept, prof_id) for (name_key, dept), prof_id in build_name_index(cursor).items()]
+        professor_ids = build_table(name_rows, (NAME, DEPT), (INT,), depts)
+        del name_rows
+
+        professor_course_stats = build_table(
+            ((professor_id, dept, int(course_id), rating, hours)
+             for professor_id, dept, course_id, rating, hours in read_stats(cursor, 'prof_course_stats')),
+            (INT, DEPT, INT), (FLOAT, FLOAT), depts
+        )
+
+        # Cross-listings from build_course_aliases.py. Without the table, requests fall back
+        # to trying each of the search page's other listings.
+        try:
+            cursor.execute("SELECT dept, course_id, canonical_dept, canonical_course_id FROM course_aliases")
+            course_aliases = build_table(cursor, (DEPT, INT), (DEPT, INT), depts)
+        except sqlite3.OperationalError:
+            course_aliases = None
+    finally:
+        conn.close()
+
+    return FeedbackLookups(
+        course_stats=course_stats,
+        professor_ids=professor_ids,
+        professor_ratings=professor_ratings,
+        professor_course_stats=professor_course_stats,
+        course_aliases=course_aliases,
+    )
+
+
+def read_lookups(db_path, version):
+    """
+    The lookups for a database version: with COMPACT_SNAPSHOT, mapped from the snapshot file
+    publish_database.py wrote next to it if there is one for this version; otherwise
+    load_snapshot(db_path).
+    """
+    if COMPACT_SNAPSHOT:
+        try:
+            tables = map_snapshot_file(snapshot_file_path(db_path), version)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not map the snapshot file for '{db_path}', loading the database: {e}")
+            tables = None
+        if tables is not None:
+            return FeedbackLookups(**tables)
+    return load_snapshot(db_path)
+
+
+def pointer_path(db_path):
+    return os.path.splitext(db_path)[0] + '.current'
+
+
+def resolve_db_path(db_path):
+    """
+    The database file requests should read.
+
+    If a pointer file sits next to db_path, the versioned database it names; otherwise
+    db_path itself. The pointer is only re-read when it is replaced, so this is one
+    os.stat per call. A pointer naming a file that has not arrived yet is ignored until it does.
+    """
+    pointer = pointer_path(db_path)
+    try:
+        signature = db_signature(pointer)
+    except FileNotFoundError:
+        return db_path
+
+    cached = _pointers.get(pointer)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with open(pointer) as f:
+        target = os.path.join(os.path.dirname(db_path), os.path.basename(f.read().strip()))
+    if not os.path.exists(target):
+        return cached[1] if cached is not None else db_path
+    _pointers[pointer] = (signature, target)
+    return target
+
+
+def data_version(db_path):
+    """
+    Short content hash identifying the deployed database.
+
+    Versioned files from publish_database.py carry the hash in their name. Anything else
+    is only re-hashed when its inode, size or mtime changes, so in the common case this
+    costs a single os.stat.
+    """
+    match = VERSIONED_NAME.search(db_path)
+    if match:
+        return match.group(1)
+
+    signature = db_signature(db_path)
+    cached = _versions.get(db_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(db_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:16]
+    _versions[db_path] = (signature, version)
+    return version
+
+
+def active_snapshot(db_path):
+    """
+    Return the Snapshot to serve the current request from.
+
+    The first call loads the snapshot synchronously (and raises if it can't; for
+    RETRY_SECONDS after that, calls return a Snapshot without lookups instead of trying
+    again). After that, when a new database version is published the old snapshot keeps
+    being served while the new one loads on a background thread, and is then swapped in
+    with a single assignment. Requests already holding the old Snapshot finish on it.
+
+    Args:
+        db_path (str): The configured path to course_feedback.db.
+
+    Returns:
+        Snapshot: The version, database path and in-memory lookups (None while a failed
+        first load waits to be retried).
+    """
+    global _active
+    target = resolve_db_path(db_path)
+    version = data_version(target)
+    active = _active
+    if active is not None and active.version == version:
+        return active
+
+    if active is None:
+        if _recently_failed(version):
+            return Snapshot(version, target, None)
+        with _active_lock:
+            if _active is None or _active.version != version:
+                if _recently_failed(version):
+                    return Snapshot(version, target, None)
+                try:
+                    _active = Snapshot(version, target, read_lookups(target, version))
+                except Exception:
+                    _failed[version] = time.monotonic()
+                    raise
+            return _active
+
+    with _active_lock:
+        if version in _warming or _recently_failed(version):
+            return active
+        _warming.add(version)
+    threading.Thread(target=_warm_snapshot, args=(version, target), name=f"snapshot-{version}", daemon=True).start()
+    return active
+
+
+def _recently_failed(version):
+    return time.monotonic() - _failed.get(version, -RETRY_SECONDS) < RETRY_SECONDS
+
+
+def _warm_snapshot(version, db_path):
+    global _active
+    try:
+        snapshot = Snapshot(version, db_path, read_lookups(db_path, version))
+    except Exception as e:
+        logging.error(f"Could not load database version {version} from '{db_path}': {e}")
+        with _active_lock:
+            _warming.discard(version)
+            _failed[version] = time.monotonic()
+        return
+    with _active_lock:
+        _active = snapshot
+        _warming.discard(version)
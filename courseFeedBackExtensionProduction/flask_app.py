@@ -1,300 +1,528 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, request, jsonify, send_from_directory
 from flask_cors import CORS
+from werkzeug.utils import safe_join
 import sqlite3
-import cProfile
-import pstats
-from io import StringIO
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from db_pool import get_connection
+from metrics import (
+    begin_request_stats, count_sql_rows, count_sql_statement, db_queries, end_request_stats,
+    render_metrics, request_courses, timed,
+)
+from feedback_snapshot import FeedbackLookups, Snapshot, active_snapshot, data_version, resolve_db_path
+from request_plan import plan_request
+from name_keys import build_name_index, find_professor_id
+from response_cache import body_cache, page_cache, page_cache_key, row_cache, row_cache_key
+from compression import EncodedBody, negotiate_encoding
+from prefetch import prefetch_index, prefetch_stream, term_cache, term_departments
+from request_profiler import (
+    DEBUG_TOKEN, dump_profile, profile_report, profiled, reset_profile, should_profile, token_is_valid,
+)
 
 app = Flask(__name__)
-CORS(app)
+# Let the extension read the per-request timing headers (see add_timing_headers)
+CORS(app, expose_headers=['Server-Timing', 'X-SQL-Statements', 'X-SQL-Rows'])
 
-# Path to your course_feedback database
-DB_PATH = '/home/benheim/courseFeedback/courseFeedBackExtensionProduction/course_feedback.db'
+# Cached in place of a row the planner skipped (unparseable courseId), so it is not re-planned
+SKIPPED_ROW = {}
 
-# Helper function to split course name into dept and course_id
-def split_course_name(course_name):
+# How long browsers and proxies may reuse a /course response without revalidating it.
+# The data changes once a quarter and the ETag changes with it.
+COURSE_MAX_AGE = int(os.environ.get('FEEDBACK_COURSE_MAX_AGE', str(7 * 24 * 60 * 60)))
+
+# Path to your course_feedback database. If publish_database.py has written a
+# course_feedback.current pointer next to it, the versioned file it names is served instead.
+DB_PATH = os.environ.get(
+    'COURSE_FEEDBACK_DB_PATH',
+    '/home/benheim/courseFeedback/courseFeedBackExtensionProduction/course_feedback.db'
+)
+
+# Per-department lookup shards written by analyzeCourseFeedback/export_shards.py
+SHARDS_DIR = os.environ.get('COURSE_FEEDBACK_SHARDS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shards'))
+
+# Department codes accepted by /prefetch
+DEPT_CODE = re.compile(r'[A-Za-z0-9_-]+')
+
+# Keys per bulk statement. Each chunk runs the same statement text, so it is prepared once
+# per connection, and a page with hundreds of sections costs a predictable number of
+# equally sized statements instead of one huge one.
+QUERY_CHUNK_SIZE = int(os.environ.get('FEEDBACK_QUERY_CHUNK_SIZE', '500'))
+
+def json_keys(keys):
+    """Encode lookup keys as one JSON array so a bulk query always binds exactly one parameter."""
+    return json.dumps([list(key) for key in keys])
+
+def fetch_chunked(cursor, query, keys, query_name):
+    """
+    Run a bulk query over keys in chunks of QUERY_CHUNK_SIZE and merge the rows.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        query (str): Statement taking the JSON-encoded keys as its only parameter.
+        keys (list): Lookup key tuples.
+        query_name (str): Label for the feedback_db_queries_total metric.
+
+    Returns:
+        list: The rows of every chunk, in chunk order.
+    """
+    results = []
+    for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+        cursor.execute(query, (json_keys(keys[start:start + QUERY_CHUNK_SIZE]),))
+        db_queries.inc(query_name)
+        results.extend(cursor.fetchall())
+    count_sql_rows(len(results))
+    return results
+
+def fetch_serving(cursor, query, legacy_query, keys, query_name, table):
+    """
+    fetch_chunked against one of the serving tables calculate_averages.py builds (one row per
+    key), or legacy_query on the per-row averages of databases from before that table.
+    """
     try:
-        dept, course_id = course_name.strip().split()
-        return dept.strip(), course_id.strip()
-    except ValueError:
-        # Return None if the format is unexpected
-        return None, None
+        return fetch_chunked(cursor, query, keys, query_name)
+    except sqlite3.OperationalError as e:
+        if table not in str(e):
+            raise
+    return fetch_chunked(cursor, legacy_query, keys, query_name)
 
-# Function to find the professor's ID based on their last name and department
+def index_professors(rows):
+    """
+    Build the (name_key, dept) -> id index from professor rows in one pass.
 
-def find_professor_ids(cursor, professors):
-    # professors -> [(last_name, [ordered_departments])]
+    Args:
+        rows (iterable): (id, name_key, dept) tuples.
 
+    Returns:
+        dict: (name_key, dept) -> professor id. If a key repeats within a department the
+        lowest id wins.
+    """
     professor_ids = {}
-    parameters = []
-    conditions = []
-    department_order = {}  # To keep track of departments for each professor
-
-    for last_name, departments in professors:
-        if last_name in department_order:
-            continue
-        department_order[last_name] = departments
-        placeholders = ','.join(['?'] * len(departments))
-        conditions.append(f"(last_name = ? AND dept IN ({placeholders}))")
-        parameters.extend([last_name] + departments)
-
-    if not conditions:
-        return professor_ids
-
-    where_clause = " OR ".join(conditions)
-
-    query = f"""
-        SELECT id, last_name, dept
-        FROM professors
-        WHERE {where_clause}
-    """
-
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-
-    # For each professor, find the first department match according to their department order
-    for last_name, departments in department_order.items():
-        for dept in departments:
-            # Check if the professor exists in this department
-            for row in results:
-                prof_id, db_last_name, db_dept = row
-                if db_last_name == last_name and db_dept == dept:
-                    professor_ids[(last_name, dept)] = prof_id
-                    break
-            if (last_name, dept) in professor_ids:
-                # Found the professor in this department, move to next professor
-                break
-
+    for prof_id, name_key, dept in rows:
+        key = (name_key, dept)
+        current = professor_ids.get(key)
+        if current is None or prof_id < current:
+            professor_ids[key] = prof_id
     return professor_ids
 
-# Function to calculate course rating based on course_id and dept
-def calculate_course_rating(cursor, dept, course_id):
-    # Columns for course rating
-    # Query to get all the course feedback for the given course
-    query = f"SELECT avg_course_rating FROM courses WHERE dept = ? AND course_id = ?"
-    cursor.execute(query, (dept, course_id))
-    results = cursor.fetchone()
-    # If no results, return None
-    if not results:
-        return None
-    return results[0]
-
-def calculate_course_ratings(cursor, courses):
-    conditions = []
-    parameters = []
-    for dept, course_id in courses:
-        conditions.append("(dept = ? AND course_id = ?)")
-        parameters.extend([dept, course_id])
-    where_clause = " OR ".join(conditions)
-    
-    # Query to fetch all rows for the given courses
-    query = f"""
-        SELECT dept, course_id, avg_course_rating
-        FROM courses
-        WHERE {where_clause}
-    """
-    
-    # Execute the query
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    
-    course_ratings = {}
-    for row in results:
-        dept = row[0]
-        course_id = row[1]
-        rating = row[2]
-        
-        # Create a key for the course
-        course_key = (dept, course_id)
-        course_ratings[course_key] = rating
-    return course_ratings
-
-# Function to calculate course hours based on time ranges
-def calculate_course_hours(cursor, dept, course_id):
-    # Columns for time spent
-    hour_columns = [
-        "less_five", "five_to_ten", "ten_to_fifteen", "fifteen_to_twenty",
-        "twenty_to_twenty_five", "twenty_five_to_thirty", "more_thirty"
-    ]
-    # Weight multipliers for each time range
-    hour_weights = [2.5, 7.5, 12.5, 17.5, 22.5, 27.5, 32.5]
-    # Query to get the time distribution for the course
-    query = f"SELECT {', '.join(hour_columns)} FROM courses WHERE dept = ? AND course_id = ?"
-    cursor.execute(query, (dept, course_id))
-    results = cursor.fetchall()
-    if not results:
-        return None
-    total_hours = 0
-    total_responses = 0
-    for result in results:
-        hours_sum = 0
-        responses_sum = 0
-        for i, count in enumerate(result):
-            if count is not None:
-                hours_sum += count * hour_weights[i]
-                responses_sum += count
-        total_hours += hours_sum
-        total_responses += responses_sum
-    if total_responses == 0:
-        return None
-    average_hours = total_hours / total_responses
-    return average_hours
-
-def calculate_courses_hours(cursor, courses):
-    conditions = []
-    parameters = []
-    for dept, course_id in courses:
-        conditions.append("(dept = ? AND course_id = ?)")
-        parameters.extend([dept, course_id])
-    where_clause = " OR ".join(conditions)
-    
-    # Query to fetch all rows for the given courses
-    query = f"""
-        SELECT dept, course_id, avg_course_hours
-        FROM courses
-        WHERE {where_clause}
-    """
-    
-    # Execute the query
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    
-    course_hours = {}
-    for row in results:
-        dept = row[0]
-        course_id = row[1]
-        rating = row[2]
-        
-        # Create a key for the course
-        course_key = (dept, course_id)
-        course_hours[course_key] = rating
-    return course_hours
-
-def calculate_professors_ratings(cursor, professor_ids):
-    conditions = []
-    parameters = []
-    for id in professor_ids.values():
-        conditions.append("(id = ?)")
-        parameters.extend([id])
-    where_clause = " OR ".join(conditions)
-    
-    # Query to fetch all rows for the given courses
-    query = f"""
-        SELECT id, avg_professor_rating
-        FROM professors
-        WHERE {where_clause}
-    """
-    # Execute the query
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    
-    professor_ratings = {}
-    for row in results:
-        id = row[0]
-        rating = row[1]
-
-        # Create a key for the course
-        professor_key = (id)
-        professor_ratings[professor_key] = rating
-    return professor_ratings
-
-
-def calculate_professor_course_ratings(cursor, professor_course_ids):
-    """
-    Calculate professor-course ratings using a singular query.
+def resolve_professors(cursor, professors):
+    """
+    Resolve professor IDs and professor ratings together, one statement per chunk of keys.
+
+    Names are looked up in the professor_name_keys table built by
+    analyzeCourseFeedback/build_name_index.py: one exact probe per (name key, dept), with
+    the rating joined from professor_stats. A professor without a professor_stats row gets
+    the avg_professor_rating on its professors row.
 
     Args:
         cursor (sqlite3.Cursor): The database cursor.
-        professor_course_ids (list): List of tuples, where each tuple contains (professor_id, dept, course_id).
+        professors (list): List of (name_keys, [ordered_departments]) tuples, with the
+            keys from name_keys.lookup_names.
 
     Returns:
-        dict: A dictionary with keys as (professor_id, dept, course_id) and values as avg_prof_course_rating.
-    """
-    conditions = []
-    parameters = []
-    
-    # Build WHERE clause for the query
-    for professor_id, dept, course_id in professor_course_ids:
-        conditions.append("(cp.professor_id = ? AND c.dept = ? AND c.course_id = ?)")
-        parameters.extend([professor_id, dept, course_id])
-    
-    if not conditions:
-        return {}
-    
-    where_clause = " OR ".join(conditions)
-    
-    # Query to fetch all avg_prof_course_rating for the given professor-course combinations
-    query = f"""
-        SELECT cp.professor_id, c.dept, c.course_id, cp.avg_prof_course_rating
-        FROM courses_professors cp
-        JOIN courses c ON cp.course_id = c.id
-        WHERE {where_clause}
-    """
-    
-    # Execute the query
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    
-    # Build the result dictionary
-    professor_course_ratings = {}
-    for row in results:
-        professor_id = row[0]
-        dept = row[1]
-        course_id = row[2]
-        avg_rating = row[3]
-        
-        professor_course_ratings[(professor_id, dept, course_id)] = avg_rating
-    
-    return professor_course_ratings
-
-# Function to calculate professor course hours for a specific professor teaching a specific course
-def calculate_professor_courses_hours(cursor, professor_course_ids):
-    """
-    Calculate professor-course hours using a singular query.
+        tuple: (professor_ids, professor_ratings) where professor_ids maps every matching
+        (name_key, dept) to the professor id (find_professor_id applies each row's
+        department priority), and professor_ratings maps professor id to avg_professor_rating.
+    """
+    # Every distinct (name_key, dept) pair, whichever row and department list it came from
+    lookup_keys = list(dict.fromkeys(
+        (name, dept) for names, departments in professors for name in names for dept in departments
+    ))
+    if not lookup_keys:
+        return {}, {}
+
+    # The (name_key, dept) pairs are bound as one JSON array so the statement text never changes
+    query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS name_key, json_extract(value, '$[1]') AS dept
+            FROM json_each(?)
+        )
+        SELECT k.professor_id, k.name_key, k.dept, COALESCE(s.avg_professor_rating, p.avg_professor_rating)
+        FROM keys
+        CROSS JOIN professor_name_keys k ON k.name_key = keys.name_key AND k.dept = keys.dept
+        LEFT JOIN professor_stats s ON s.professor_id = k.professor_id
+        LEFT JOIN professors p ON p.id = k.professor_id
+    """
+    legacy_query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS name_key, json_extract(value, '$[1]') AS dept
+            FROM json_each(?)
+        )
+        SELECT k.professor_id, k.name_key, k.dept, p.avg_professor_rating
+        FROM keys
+        CROSS JOIN professor_name_keys k ON k.name_key = keys.name_key AND k.dept = keys.dept
+        LEFT JOIN professors p ON p.id = k.professor_id
+    """
+    try:
+        rows = fetch_serving(cursor, query, legacy_query, lookup_keys, 'professors', 'professor_stats')
+        professor_ids = index_professors((prof_id, name_key, dept) for prof_id, name_key, dept, _ in rows)
+        return professor_ids, {prof_id: rating for prof_id, _, _, rating in rows}
+    except sqlite3.OperationalError as e:
+        if 'professor_name_keys' not in str(e):
+            raise
+
+    # Databases without the name index: read the departments' professors and index them here
+    query = """
+        SELECT p.id, p.first_name, p.last_name, p.dept, COALESCE(s.avg_professor_rating, p.avg_professor_rating)
+        FROM professors p
+        LEFT JOIN professor_stats s ON s.professor_id = p.id
+        WHERE p.dept IN (SELECT json_extract(value, '$[0]') FROM json_each(?))
+    """
+    legacy_query = """
+        SELECT p.id, p.first_name, p.last_name, p.dept, p.avg_professor_rating
+        FROM professors p
+        WHERE p.dept IN (SELECT json_extract(value, '$[0]') FROM json_each(?))
+    """
+    departments = [(dept,) for dept in dict.fromkeys(dept for _, dept in lookup_keys)]
+    rows = fetch_serving(cursor, query, legacy_query, departments, 'professors', 'professor_stats')
+    professor_ids = build_name_index(row[:4] for row in rows)
+    return professor_ids, {row[0]: row[4] for row in rows}
+
+def resolve_courses(cursor, courses):
+    """
+    Resolve course rating and course hours together with the course aliases, one statement
+    per chunk of keys.
+
+    Each course is joined against the course_aliases table from build_course_aliases.py, and
+    the stats come from the listing it is aliased to (aliases have no feedback of their own)
+    or else from the course itself.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        courses (list): List of (dept, course_id) tuples.
+
+    Returns:
+        tuple: (course_stats, course_aliases) where course_stats maps (dept, course_id) to
+        (avg_course_rating, avg_course_hours) for the courses found and the listings they are
+        aliased to, and course_aliases maps (dept, course_id) to the canonical (dept, course_id)
+        for the courses that are aliases, or is None if the database has no course_aliases table.
+    """
+    if not courses:
+        return {}, {}
+
+    # Query to fetch all rows for the given courses, joined against a JSON array of keys.
+    # {table} is course_stats, or courses on databases from before the serving tables.
+    query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS dept, json_extract(value, '$[1]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT a.dept, a.course_id, a.canonical_dept, a.canonical_course_id,
+            s.dept, s.course_id, s.avg_course_rating, s.avg_course_hours
+        FROM keys
+        LEFT JOIN course_aliases a ON a.dept = keys.dept AND a.course_id = keys.course_id
+        LEFT JOIN {table} s
+            ON s.dept = COALESCE(a.canonical_dept, keys.dept) AND s.course_id = COALESCE(a.canonical_course_id, keys.course_id)
+        WHERE a.dept IS NOT NULL OR s.dept IS NOT NULL
+    """
+    try:
+        rows = fetch_serving(
+            cursor, query.format(table='course_stats'), query.format(table='courses'), courses, 'courses', 'course_stats'
+        )
+    except sqlite3.OperationalError as e:
+        if 'course_aliases' not in str(e):
+            raise
+    else:
+        course_stats = {}
+        course_aliases = {}
+        for dept, course_id, canonical_dept, canonical_course_id, stats_dept, stats_course_id, rating, hours in rows:
+            if dept is not None:
+                course_aliases[(dept, course_id)] = (canonical_dept, canonical_course_id)
+            if stats_dept is not None:
+                course_stats[(stats_dept, stats_course_id)] = (rating, hours)
+        return course_stats, course_aliases
+
+    # Databases without the alias table: every course is looked up as itself
+    query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS dept, json_extract(value, '$[1]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT s.dept, s.course_id, s.avg_course_rating, s.avg_course_hours
+        FROM keys
+        CROSS JOIN course_stats s ON s.dept = keys.dept AND s.course_id = keys.course_id
+    """
+    legacy_query = """
+        WITH keys AS (
+            SELECT json_extract(value, '$[0]') AS dept, json_extract(value, '$[1]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT c.dept, c.course_id, c.avg_course_rating, c.avg_course_hours
+        FROM keys
+        CROSS JOIN courses c ON c.dept = keys.dept AND c.course_id = keys.course_id
+    """
+
+    course_stats = {}
+    for dept, course_id, rating, hours in fetch_serving(cursor, query, legacy_query, courses, 'courses', 'course_stats'):
+        course_stats[(dept, course_id)] = (rating, hours)
+    return course_stats, None
+
+def resolve_professor_courses(cursor, professor_course_ids):
+    """
+    Resolve professor-course rating and hours together, one statement per chunk of keys.
 
     Args:
         cursor (sqlite3.Cursor): The database cursor.
         professor_course_ids (list): List of tuples, where each tuple contains (professor_id, dept, course_id).
 
     Returns:
-        dict: A dictionary with keys as (professor_id, dept, course_id) and values as avg_prof_course_hours.
-    """
-    conditions = []
-    parameters = []
-    
-    # Build WHERE clause for the query
-    for professor_id, dept, course_id in professor_course_ids:
-        conditions.append("(cp.professor_id = ? AND c.dept = ? AND c.course_id = ?)")
-        parameters.extend([professor_id, dept, course_id])
-    
-    if not conditions:
+        dict: A dictionary with keys as (professor_id, dept, course_id) and values as
+        (avg_prof_course_rating, avg_prof_course_hours).
+    """
+    if not professor_course_ids:
         return {}
-    
-    where_clause = " OR ".join(conditions)
-    
-    # Query to fetch all avg_prof_course_hours for the given professor-course combinations
-    query = f"""
-        SELECT cp.professor_id, c.dept, c.course_id, cp.avg_prof_course_hours
-        FROM courses_professors cp
-        JOIN courses c ON cp.course_id = c.id
-        WHERE {where_clause}
-    """
-    
-    # Execute the query
-    cursor.execute(query, parameters)
-    results = cursor.fetchall()
-    
-    # Build the result dictionary
-    professor_course_hours = {}
-    for row in results:
-        professor_id = row[0]
-        dept = row[1]
-        course_id = row[2]
-        avg_hours = row[3]
-        
-        professor_course_hours[(professor_id, dept, course_id)] = avg_hours
-    
-    return professor_course_hours
+
+    # The combinations are bound as a single JSON array so the statement is prepared once
+    query = """
+        WITH keys AS (
+            SELECT
+                json_extract(value, '$[0]') AS professor_id,
+                json_extract(value, '$[1]') AS dept,
+                json_extract(value, '$[2]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT s.professor_id, s.dept, s.course_id, s.avg_prof_course_rating, s.avg_prof_course_hours
+        FROM keys
+        CROSS JOIN prof_course_stats s
+            ON s.professor_id = keys.professor_id AND s.dept = keys.dept AND s.course_id = keys.course_id
+    """
+    legacy_query = """
+        WITH keys AS (
+            SELECT
+                json_extract(value, '$[0]') AS professor_id,
+                json_extract(value, '$[1]') AS dept,
+                json_extract(value, '$[2]') AS course_id
+            FROM json_each(?)
+        )
+        SELECT cp.professor_id, c.dept, c.course_id, cp.avg_prof_course_rating, cp.avg_prof_course_hours
+        FROM keys
+        CROSS JOIN courses c ON c.dept = keys.dept AND c.course_id = keys.course_id
+        JOIN courses_professors cp ON cp.course_id = c.id AND cp.professor_id = keys.professor_id
+    """
+
+    professor_course_stats = {}
+    rows = fetch_serving(
+        cursor, query, legacy_query, professor_course_ids, 'professor_courses', 'prof_course_stats'
+    )
+    for professor_id, dept, course_id, rating, hours in rows:
+        professor_course_stats[(professor_id, dept, course_id)] = (rating, hours)
+    return professor_course_stats
+
+def average(values):
+    """Average of the truthy values, or None if there are none."""
+    valid_values = [value for value in values if value]
+    return sum(valid_values) / len(valid_values) if valid_values else None
+
+def resolve_course(row, course_stats, course_aliases):
+    """
+    Find the course rating and hours for a row.
+
+    With the alias table from build_course_aliases.py the row's course is first mapped to
+    the listing its feedback is stored under. If that finds nothing (no table, or a
+    cross-listing the link scrape never saw), each of the row's cross-listings is tried.
+
+    Args:
+        row (RowPlan): The parsed search-page row.
+        course_stats (dict): (dept, course_id) -> (avg_course_rating, avg_course_hours).
+        course_aliases (dict): (dept, course_id) -> canonical (dept, course_id), or None.
+
+    Returns:
+        tuple: (course_name, course_key, course_rating, course_hours), where course_key is
+        the key the feedback is stored under and course_name the listing it was found under.
+    """
+    course_key = (row.dept, row.course_id)
+    if course_aliases is not None:
+        canonical_key = course_aliases.get(course_key)
+        if canonical_key is not None:
+            course_rating, course_hours = course_stats.get(canonical_key, (None, None))
+            if course_rating is not None:
+                return listing_name(row, canonical_key), canonical_key, course_rating, course_hours
+
+    course_rating, course_hours = course_stats.get(course_key, (None, None))
+    if course_rating is None:
+        for listing, alt_dept, alt_course_id in row.listings:
+            alt_rating, alt_hours = course_stats.get((alt_dept, alt_course_id), (None, None))
+            if alt_rating is not None:
+                return listing, (alt_dept, alt_course_id), alt_rating, alt_hours
+    return row.course_name, course_key, course_rating, course_hours
+
+def listing_name(row, course_key):
+    """The row's own spelling of a listing (as the cross-listing loop returns it), or 'DEPT 12345'."""
+    for listing, alt_dept, alt_course_id in row.listings:
+        if (alt_dept, alt_course_id) == course_key:
+            return listing
+    return f"{course_key[0]} {course_key[1]}"
+
+def fallback_listings(row, course_key, course_aliases):
+    """
+    The cross-listings to try per request, kept to what the alias table can't answer.
+
+    None when the table resolved the course. Otherwise (a cross-listing the link scrape
+    missed, or several listings with feedback of their own) every listing the table does
+    not map elsewhere; an aliased listing has no feedback to find. Without the table, all of them.
+    """
+    if course_aliases is None:
+        return row.listings
+    if course_key != (row.dept, row.course_id) and course_aliases.get((row.dept, row.course_id)) == course_key:
+        return ()
+    return [listing for listing in row.listings if (listing[1], listing[2]) not in course_aliases]
+
+def resolve_professor_course(professor_course_stats, professor_id, course_key, listings):
+    """Professor-course rating and hours, filling whichever is missing from the cross-listings."""
+    prof_course_rating, prof_course_hours = professor_course_stats.get((professor_id,) + course_key, (None, None))
+
+    # If no rating found, try alternative department-course combinations
+    if prof_course_rating is None or prof_course_hours is None:
+        for _, alt_dept, alt_course_id in listings:
+            alt_prof_course_rating, alt_prof_course_hours = professor_course_stats.get(
+                (professor_id, alt_dept, alt_course_id), (None, None)
+            )
+
+            # Use the first valid rating we find
+            if prof_course_rating is None and alt_prof_course_rating is not None:
+                prof_course_rating = alt_prof_course_rating
+
+            if prof_course_hours is None and alt_prof_course_hours is not None:
+                prof_course_hours = alt_prof_course_hours
+
+            # Stop searching if both values are found
+            if prof_course_rating is not None and prof_course_hours is not None:
+                break
+
+    return prof_course_rating, prof_course_hours
+
+def query_lookups(cursor, plan):
+    """
+    Run the bulk SQL queries for a single request.
+
+    Only used when the in-memory snapshot could not be loaded.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        plan (RequestPlan): The parsed request.
+
+    Returns:
+        FeedbackLookups: Lookup tables restricted to the courses and professors in the request.
+    """
+    # Perform bulk queries for courses and professors: every listing on the page, with the
+    # listing each one is aliased to coming back in the same statement (see resolve_course)
+    with timed('query_courses'):
+        course_stats, course_aliases = resolve_courses(cursor, list(plan.course_keys))
+    with timed('query_professors'):
+        professor_ids, professor_ratings = resolve_professors(cursor, plan.professor_keys)
+
+    # Collect the professor-course combinations for every row (and the listings fallback_listings keeps)
+    professor_course_ids = set()
+    for row in plan.rows:
+        _, course_key, _, _ = resolve_course(row, course_stats, course_aliases)
+        for names in row.professor_names:
+            professor_id = find_professor_id(professor_ids, names, row.departments)
+            if professor_id:
+                professor_course_ids.add((professor_id,) + course_key)
+                for _, alt_dept, alt_course_id in fallback_listings(row, course_key, course_aliases):
+                    professor_course_ids.add((professor_id, alt_dept, alt_course_id))
+
+    # Now perform the bulk query for professor-course data
+    with timed('query_professor_courses'):
+        professor_course_stats = resolve_professor_courses(cursor, list(professor_course_ids))
+
+    return FeedbackLookups(
+        course_stats=course_stats,
+        professor_ids=professor_ids,
+        professor_ratings=professor_ratings,
+        professor_course_stats=professor_course_stats,
+        course_aliases=course_aliases,
+    )
+
+def data_source():
+    """
+    The Snapshot this request is served from, chosen once when the request starts.
+
+    If the in-memory snapshot can't be loaded, lookups is None and the request queries
+    the database file directly.
+    """
+    try:
+        return active_snapshot(DB_PATH)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"Could not load feedback snapshot, falling back to SQL: {e}")
+        db_path = resolve_db_path(DB_PATH)
+        return Snapshot(data_version(db_path), db_path, None)
+
+def load_lookups(plan, source):
+    """Return the in-memory snapshot, or query SQLite for this request if it is unavailable."""
+    if source.lookups is not None:
+        return source.lookups
+
+    # Pooled per-thread connection; it stays open between requests. The trace callback counts
+    # every statement for the X-SQL-Statements header, so an N+1 pattern shows up immediately.
+    conn = get_connection(source.db_path)
+    conn.set_trace_callback(count_sql_statement)
+    cursor = conn.cursor()
+    try:
+        return query_lookups(cursor, plan)
+    finally:
+        cursor.close()
+
+def build_feedback(plan, lookups):
+    """
+    Assemble the response rows for a parsed request.
+
+    Args:
+        plan (RequestPlan): The parsed request.
+        lookups (FeedbackLookups): Aggregates covering every key in the plan.
+
+    Returns:
+        list: One feedback dict per planned row, in page order.
+    """
+    feedback_data = []
+    for row in plan.rows:
+        course_name, course_key, course_rating, course_hours = resolve_course(
+            row, lookups.course_stats, lookups.course_aliases
+        )
+
+        single_course_professor_ratings = []
+        single_course_professor_course_ratings = []
+        single_course_professor_course_hours = []
+
+        for names in row.professor_names:
+            professor_id = find_professor_id(lookups.professor_ids, names, row.departments)
+            if professor_id:
+                single_course_professor_ratings.append(lookups.professor_ratings.get(professor_id))
+                prof_course_rating, prof_course_hours = resolve_professor_course(
+                    lookups.professor_course_stats, professor_id, course_key,
+                    fallback_listings(row, course_key, lookups.course_aliases)
+                )
+                single_course_professor_course_ratings.append(prof_course_rating)
+                single_course_professor_course_hours.append(prof_course_hours)
+
+        feedback_data.append({
+            'courseId': course_name,
+            'course_rating': course_rating,
+            'professor_rating': average(single_course_professor_ratings),
+            'professor_course_rating': average(single_course_professor_course_ratings),
+            'course_hours': course_hours,
+            'professor_course_hours': average(single_course_professor_course_hours),
+            'feedback_urls': f"https://coursefeedback.uchicago.edu/?CourseDepartment={row.dept}&CourseNumber={row.course_id}"
+        })
+    return feedback_data
+
+@app.before_request
+def start_request_stats():
+    begin_request_stats()
+
+# Every response reports where its time went: one Server-Timing entry per stage (shown in the
+# devtools network panel) plus the number of SQL statements and rows the request needed.
+@app.after_request
+def add_timing_headers(response):
+    stats = end_request_stats()
+    if stats is not None:
+        response.headers['Server-Timing'] = stats.server_timing()
+        response.headers['X-SQL-Statements'] = str(stats.sql_statements)
+        response.headers['X-SQL-Rows'] = str(stats.sql_rows)
+    return response
 
 @app.route('/')
 def home():
@@ -304,248 +532,273 @@ def home():
 # Route to handle course data and return the course rating, professor rating, course hours, and professor course hours
 @app.route('/get-course-feedback', methods=['POST'])
 def get_course_feedback():
-    profiler = cProfile.Profile()
-    profiler.enable()
-    data = request.json
-    feedback_data = []
+    # Profiling is opt-in: sampled 1 in N requests or requested with X-Profile (see request_profiler.py)
+    with profiled(should_profile(request.headers)):
+        with timed('parse'):
+            data = request.json
+        request_courses.observe(len(data))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        body, encoding = encoded_feedback(data, data_source(), encoding)
+
+    # Return the feedback data as JSON, compressed if the client accepts it
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response, 200
+
+def encoded_feedback(data, source, encoding):
+    """
+    The serialized feedback for a payload, compressed with encoding if it is worth it.
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    Serialized pages are cached along with their compressed forms, so a page the extension
+    re-sends is neither re-serialized nor re-compressed.
 
-    try:
-        course_keys = set()
-        professor_keys = []
-        professor_course_ids = set()  # Stores professor-course mappings
-
-        # Process each course to collect course_keys and professor_keys
-        for course in data:
-            course_name = course['courseId']
-            other_listings = course['otherListings']
-            dept, course_id = split_course_name(course_name)
-            course_keys.add((dept, course_id))
-
-            # Collect alternative listings
-            for listing in other_listings:
-                alt_dept, alt_course_id = split_course_name(listing)
-                if alt_dept and alt_course_id:
-                    course_keys.add((alt_dept, alt_course_id))
-
-            professor_last_name = course['instructor']
-            professor_names = [name.strip() for name in professor_last_name.split(',')] if ',' in professor_last_name else [professor_last_name.strip()]
-
-            # Collect professor_keys with department order
-            departments_order = [dept] + [split_course_name(listing)[0] for listing in other_listings if split_course_name(listing)[0]]
-            for name in professor_names:
-                professor_keys.append((name, departments_order))
-
-        # Perform bulk queries for courses and professors
-        course_ratings = calculate_course_ratings(cursor, list(course_keys))
-        courses_hours = calculate_courses_hours(cursor, list(course_keys))
-        professor_ids = find_professor_ids(cursor, professor_keys)
-        professor_ratings = calculate_professors_ratings(cursor, professor_ids)
-
-        # Now process each course individually to collect professor_course_ids and prepare data
-        for course in data:
-            course_name = course['courseId']
-            other_listings = course['otherListings']
-            professor_last_name = course['instructor']
-
-            dept, course_id = split_course_name(course_name)
-            if course_id:
-                course_id = int(course_id)
-            if not dept or not course_id:
-                continue
-
-            # Initialize actual_dept and actual_course_id
-            actual_dept, actual_course_id = dept, course_id
-
-            # Fetch course rating and hours
-            course_rating = course_ratings.get((dept, course_id))
-            course_hours = courses_hours.get((dept, course_id))
-            # Handle alternative listings if no rating found
-            if course_rating is None:
-                for listing in other_listings:
-                    alt_dept, alt_course_id = split_course_name(listing)
-                    if alt_course_id:
-                        alt_course_id = int(alt_course_id)
-                    if alt_dept and alt_course_id:
-                        course_rating = course_ratings.get((alt_dept, alt_course_id))
-                        course_hours = courses_hours.get((alt_dept, alt_course_id))
-                        if course_rating is not None:
-                            course_name = listing
-                            actual_dept, actual_course_id = alt_dept, alt_course_id
-                            break
-
-            # Collect departments in order
-            departments = [dept] + [split_course_name(listing)[0] for listing in other_listings if split_course_name(listing)[0]]
-
-            # Process professors for this course and all its listings
-            professor_names = [name.strip() for name in professor_last_name.split(',')] if ',' in professor_last_name else [professor_last_name.strip()]
-
-            for name in professor_names:
-                # Find the professor ID based on department order
-                professor_id = None
-                for dept_option in departments:
-                    professor_id = professor_ids.get((name, dept_option))
-                    if professor_id:
-                        break
-
-                if professor_id:
-                    # Collect professor_course_id for the main course
-                    professor_course_ids.add((professor_id, actual_dept, actual_course_id))
-
-                    # Collect professor_course_id for each alternative listing
-                    for listing in other_listings:
-                        alt_dept, alt_course_id = split_course_name(listing)
-                        if alt_dept and alt_course_id:
-                            professor_course_ids.add((professor_id, alt_dept, int(alt_course_id)))
-
-        # Now perform bulk queries for professor-course data
-        professor_course_ids_list = list(professor_course_ids)
-        professor_course_hours = calculate_professor_courses_hours(cursor, professor_course_ids_list)
-        professor_course_ratings = calculate_professor_course_ratings(cursor, professor_course_ids_list)
-   
-        # Now process each course again to compile feedback_data
-        for course in data:
-            course_name = course['courseId']
-            other_listings = course['otherListings']
-            professor_last_name = course['instructor']
-
-            dept, course_id = split_course_name(course_name)
-            if course_id:
-                course_id = int(course_id)
-            if not dept or not course_id:
-                continue
-
-            # Initialize actual_dept and actual_course_id
-            actual_dept, actual_course_id = dept, course_id
-
-            # Fetch course rating and hours
-            course_rating = course_ratings.get((dept, course_id))
-            course_hours = courses_hours.get((dept, course_id))
-
-            # Handle alternative listings if no rating found
-            if course_rating is None:
-                for listing in other_listings:
-                    alt_dept, alt_course_id = split_course_name(listing)
-                    if alt_course_id:
-                        alt_course_id = int(alt_course_id)
-                    if alt_dept and alt_course_id:
-                        course_rating = course_ratings.get((alt_dept, alt_course_id))
-                        course_hours = courses_hours.get((alt_dept, alt_course_id))
-                        if course_rating is not None:
-                            course_name = listing
-                            actual_dept, actual_course_id = alt_dept, alt_course_id
-                            break
-
-            # Collect departments in order
-            departments = [dept]
-            for listing in other_listings:
-                alt_dept, _ = split_course_name(listing)
-                if alt_dept:
-                    departments.append(alt_dept)
-
-            # Process professors for this course
-            professor_names = [name.strip() for name in professor_last_name.split(',')] if ',' in professor_last_name else [professor_last_name.strip()]
-
-            single_course_professor_ratings = []
-            single_course_professor_course_ratings = []
-            single_course_professor_course_hours = []
-
-            for name in professor_names:
-                # Find the professor ID based on department order
-                professor_id = None
-                for dept_option in departments:
-                    professor_id = professor_ids.get((name, dept_option))
-                    if professor_id:
-                        break
-                """
-                if professor_id:
-                    # Use actual_dept and actual_course_id to look up professor-course data
-                    prof_course_key = (professor_id, actual_dept, actual_course_id)
-                    single_course_professor_course_ratings.append(
-                        professor_course_ratings.get(prof_course_key)
-                    )
-                    single_course_professor_course_hours.append(
-                        professor_course_hours.get(prof_course_key)
-                    )
-                    single_course_professor_ratings.append(professor_ratings.get(professor_id))
-                """
-
-
-                if professor_id:
-
-                    single_course_professor_ratings.append(professor_ratings.get(professor_id))
-                    
-                    # First attempt: Use actual_dept and actual_course_id
-                    prof_course_key = (professor_id, actual_dept, actual_course_id)
-                    prof_course_rating = professor_course_ratings.get(prof_course_key)
-                    prof_course_hours = professor_course_hours.get(prof_course_key)
-                    
-                    # If no rating found, try alternative department-course combinations
-                    if prof_course_rating is None or prof_course_hours is None:
-
-                        for listing in other_listings:
-                            alt_dept, alt_course_id = split_course_name(listing)
-                            if alt_dept and alt_course_id:
-                                alt_course_id = int(alt_course_id)
-                                alt_prof_course_key = (professor_id, alt_dept, alt_course_id)
-        
-                                alt_prof_course_rating = professor_course_ratings.get(alt_prof_course_key)
-                                alt_prof_course_hours = professor_course_hours.get(alt_prof_course_key)
-
-                                # Use the first valid rating we find
-                                if prof_course_rating is None and alt_prof_course_rating is not None:
-                                    prof_course_rating = alt_prof_course_rating
-
-                                if prof_course_hours is None and alt_prof_course_hours is not None:
-                                    prof_course_hours = alt_prof_course_hours
-
-                                # Stop searching if both values are found
-                                if prof_course_rating is not None and prof_course_hours is not None:
-                                    break
-
-                    # Append final values
-                    single_course_professor_course_ratings.append(prof_course_rating)
-                    single_course_professor_course_hours.append(prof_course_hours)
-
-            # Calculate averages
-            valid_professor_ratings = list(filter(None, single_course_professor_ratings))
-            avg_professor_rating = (
-                sum(valid_professor_ratings) / len(valid_professor_ratings)
-                if valid_professor_ratings else None
-            )
-            valid_professor_course_ratings = list(filter(None, single_course_professor_course_ratings))
-            avg_professor_course_rating = (
-                sum(valid_professor_course_ratings) / len(valid_professor_course_ratings)
-                if valid_professor_course_ratings else None
-            )
-            valid_professor_course_hours = list(filter(None, single_course_professor_course_hours))
-            avg_professor_course_hours = (
-                sum(valid_professor_course_hours) / len(valid_professor_course_hours)
-                if valid_professor_course_hours else None
-            )
-        
-            # Append the results to the feedback_data list
-            feedback_data.append({
-                'courseId': course_name,
-                'course_rating': course_rating,
-                'professor_rating': avg_professor_rating,
-                'professor_course_rating': avg_professor_course_rating,
-                'course_hours': course_hours,
-                'professor_course_hours': avg_professor_course_hours,
-                'feedback_urls': f"https://coursefeedback.uchicago.edu/?CourseDepartment={dept}&CourseNumber={course_id}"
-            })
-        # Return the feedback data as JSON
-        return jsonify(feedback_data), 200
+    Args:
+        data (list): The courses sent by the extension.
+        source (Snapshot): The data to resolve from (see data_source).
+        encoding (str): 'br', 'gzip' or None, from negotiate_encoding.
 
-    finally:
-        # Close the database connection after all processing is complete
-        conn.close()
-        profiler.disable()
-        s = StringIO()
-        ps = pstats.Stats(profiler, stream=s).sort_stats('cumtime')
-        ps.print_stats()
+    Returns:
+        tuple: (body bytes, the content coding used or None).
+    """
+    version = source.version
+    with timed('cache_lookup'):
+        page_key = page_cache_key(data)
+        body = body_cache.get(page_key, version)
+    if body is None:
+        feedback_data = cached_feedback(data, source)
+        with timed('serialize'):
+            # Byte for byte what jsonify(feedback_data) would send
+            body = EncodedBody(app.json.response(feedback_data).get_data())
+        body_cache.put(page_key, body, version)
+    with timed('compress'):
+        return body.encoded(encoding)
+
+def cached_feedback(data, source):
+    """
+    Feedback for a payload, served from the page and row caches where possible.
+
+    The extension re-sends the same page every time the search results re-render, so
+    whole pages are cached. Rows are cached individually too, so pages that overlap
+    (paging, re-sorting) only resolve the rows that are new.
+
+    Args:
+        data (list): The courses sent by the extension.
+        source (Snapshot): The data to resolve from (see data_source). Cache entries are
+            tied to its version.
+    """
+    version = source.version
+    with timed('cache_lookup'):
+        page_key = page_cache_key(data)
+        feedback_data = page_cache.get(page_key, version)
+    if feedback_data is not None:
+        return feedback_data
+
+    row_keys = [row_cache_key(course) for course in data]
+    rows = [row_cache.get(row_key, version) for row_key in row_keys]
+    missing = [index for index, row in enumerate(rows) if row is None]
+
+    if missing:
+        # Parse the payload once; every later stage reads the plan
+        with timed('plan'):
+            plan = plan_request([data[index] for index in missing])
+
+        # All aggregates come from the startup snapshot, so there is no SQL on this path
+        with timed('lookup'):
+            lookups = load_lookups(plan, source)
+        with timed('assemble'):
+            resolved = dict(zip((row.index for row in plan.rows), build_feedback(plan, lookups)))
+
+        for position, index in enumerate(missing):
+            # Rows the planner skipped produce no output; cache that too
+            rows[index] = resolved.get(position, SKIPPED_ROW)
+            row_cache.put(row_keys[index], rows[index], version)
+
+    feedback_data = [row for row in rows if row is not SKIPPED_ROW]
+    page_cache.put(page_key, feedback_data, version)
+    return feedback_data
+
+# Cacheable single-course lookup: GET /course/ECON/20000?instructors=Smith,Jones&listings=PPHA 20000
+# Resolves exactly like one row of /get-course-feedback, but can be cached by the browser and
+# any proxy: the ETag changes only when the database does, and If-None-Match gets a 304.
+@app.route('/course/<dept>/<course_id>')
+def get_course(dept, course_id):
+    course = {
+        'courseId': f"{dept} {course_id}",
+        'instructor': request.args.get('instructors', ''),
+        'otherListings': request.args.get('listings', '').split(','),
+    }
+    source = data_source()
+    etag = hashlib.sha1(repr((source.version, row_cache_key(course))).encode('utf-8')).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        feedback_data = cached_feedback([course], source)
+        if not feedback_data:
+            abort(404)
+        response = jsonify(feedback_data[0])
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = COURSE_MAX_AGE
+    return response
+
+def term_courses(source, term):
+    """
+    The (dept, course_id) pairs with feedback from a term, cached per database version.
+
+    A term is either a quarter as stored by scrapeFeedback.py ("Autumn 2024") or just the
+    season ("Autumn"), which matches that season in every year.
+    """
+    courses = term_cache.get(term, source.version)
+    if courses is None:
+        conn = get_connection(source.db_path)
+        conn.set_trace_callback(count_sql_statement)
+        rows = conn.execute(
+            "SELECT DISTINCT dept, course_id FROM courses WHERE quarter = ? OR quarter LIKE ? || ' %'",
+            (term, term)
+        ).fetchall()
+        db_queries.inc('term_courses')
+        count_sql_rows(len(rows))
+        courses = {(dept, int(course_id)) for dept, course_id in rows if course_id is not None}
+        term_cache.put(term, courses, source.version)
+    return courses
+
+# Whole-department prefetch: GET /prefetch?depts=ECON,PPHA and/or ?term=Autumn
+# Streams resolved feedback for every course (and instructor) in those departments as gzip'd
+# NDJSON, so the extension can fill a local cache once per session (format in prefetch.py).
+# With only a term, every department with feedback from that term is sent.
+@app.route('/prefetch')
+def prefetch():
+    departments = list(dict.fromkeys(dept.strip() for dept in request.args.get('depts', '').split(',') if dept.strip()))
+    term = request.args.get('term', '').strip() or None
+    if not departments and term is None:
+        abort(400)
+    if any(not DEPT_CODE.fullmatch(dept) for dept in departments):
+        abort(400)
+
+    # Needs the in-memory snapshot; resolving every course with per-request SQL is not worth it
+    source = data_source()
+    if source.lookups is None:
+        abort(503)
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), offered=('gzip',))
+    etag = hashlib.sha1(repr((source.version, departments, term, encoding)).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        courses = term_courses(source, term) if term is not None else None
+        if not departments:
+            departments = term_departments(source.lookups, prefetch_index(source.version, source.lookups), courses)
+        members = prefetch_stream(source.version, source.lookups, departments, term, courses)
+        if encoding:
+            response = Response(members, mimetype='application/x-ndjson')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            # Rare (every browser sends gzip), so the cached members are unpacked per request
+            response = Response((gzip.decompress(member) for member in members), mimetype='application/x-ndjson')
+
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = COURSE_MAX_AGE
+    return response
+
+# Manifest of the current shard version. Small and revalidated on every use, so clients
+# notice a new quarter's data; the shards it points to are immutable.
+@app.route('/shards/manifest.json')
+def get_shard_manifest():
+    response = send_from_directory(SHARDS_DIR, 'manifest.json', mimetype='application/json')
+    response.cache_control.no_cache = True
+    return response
+
+# One department's aggregates as gzip'd JSON. The path contains the data version, so the
+# file never changes and can be cached forever. export_shards.py also writes a brotli copy
+# (<dept>.json.br) when brotli is installed; clients that accept br get that instead.
+@app.route('/shards/<version>/<dept>.json.gz')
+def get_shard(version, dept):
+    # version comes from the URL; safe_join refuses anything that would leave SHARDS_DIR
+    version_dir = safe_join(SHARDS_DIR, version)
+    if version_dir is None:
+        abort(404)
+    brotli_path = safe_join(version_dir, f"{dept}.json.br")
+    offered = ('br', 'gzip') if brotli_path is not None and os.path.isfile(brotli_path) else ('gzip',)
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), offered=offered)
+    max_age = 365 * 24 * 60 * 60
+
+    if encoding == 'br':
+        response = send_from_directory(version_dir, f"{dept}.json.br", mimetype='application/json', max_age=max_age)
+        response.headers['Content-Encoding'] = 'br'
+    elif encoding == 'gzip':
+        response = send_from_directory(version_dir, f"{dept}.json.gz", mimetype='application/json', max_age=max_age)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        # No compression accepted (rare): unpack the gzip copy
+        path = safe_join(version_dir, f"{dept}.json.gz")
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        with open(path, 'rb') as f:
+            response = Response(gzip.decompress(f.read()), mimetype='application/json')
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+def request_debug_token():
+    """The debug token from X-Debug-Token, or from an Authorization: Bearer header (what Prometheus sends)."""
+    token = request.headers.get('X-Debug-Token')
+    if token is None:
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer':
+            token = credentials.strip()
+    return token
+
+# Hit/miss counters for the response caches. Requires FEEDBACK_DEBUG_TOKEN in the X-Debug-Token header.
+@app.route('/debug/cache')
+def debug_cache():
+    if not token_is_valid(request_debug_token()):
+        abort(404)
+    return jsonify({'pages': page_cache.stats(), 'rows': row_cache.stats(), 'bodies': body_cache.stats()}), 200
+
+# Per-stage latency histograms, request sizes, SQL statement counts and cache counters in the
+# Prometheus text format. Per worker process. Open unless FEEDBACK_DEBUG_TOKEN is set; then
+# the token is required like on the other debug routes.
+@app.route('/metrics')
+def get_metrics():
+    if DEBUG_TOKEN and not token_is_valid(request_debug_token()):
+        abort(404)
+    return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+# Aggregated profile of the sampled requests. Requires FEEDBACK_DEBUG_TOKEN in the X-Debug-Token header.
+#   ?sort=tottime&limit=30  change the text report
+#   ?dump=1                 write the stats to a .prof file instead
+#   ?reset=1                start a fresh aggregate
+@app.route('/debug/profile')
+def debug_profile():
+    if not token_is_valid(request_debug_token()):
+        abort(404)
+
+    if request.args.get('reset'):
+        reset_profile()
+        return "Profile reset.\n", 200, {'Content-Type': 'text/plain'}
+
+    if request.args.get('dump'):
+        path = dump_profile()
+        if path is None:
+            return "No requests have been profiled yet.\n", 404, {'Content-Type': 'text/plain'}
+        return f"Wrote {path}\n", 200, {'Content-Type': 'text/plain'}
+
+    report = profile_report(request.args.get('sort', 'cumtime'), request.args.get('limit', 50, type=int))
+    return report, 200, {'Content-Type': 'text/plain'}
+
+# Load the snapshot at startup so the first request doesn't pay for it
+try:
+    active_snapshot(DB_PATH)
+except (sqlite3.Error, OSError, ValueError) as e:
+    logging.error(f"Could not load feedback snapshot at startup: {e}")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics rendered in the Prometheus text format. Each worker process keeps
+# its own numbers; nothing here talks to an external service.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500)
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, labelvalues, [('le', repr(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues, [('le', '+Inf')])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {_format_value(float(series[-2]))}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class GaugeCallback:
+    """A gauge (or counter) whose samples are read from a callback at scrape time."""
+
+    def __init__(self, name, documentation, labelnames, callback, metric_type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback  # returns [(labelvalues, value)]
+        self.metric_type = metric_type
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labelvalues, value in self.callback():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+stage_seconds = Histogram(
+    'feedback_stage_seconds', 'Time spent in each stage of a feedback request.', ['stage']
+)
+request_courses = Histogram(
+    'feedback_request_courses', 'Courses per /get-course-feedback request.', buckets=SIZE_BUCKETS
+)
+db_queries = Counter(
+    'feedback_db_queries_total', 'SQL statements run while serving feedback requests.', ['query']
+)
+
+
+class RequestStats:
+    """Stage timings and SQL counts for one request, reported in its response headers."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}  # stage -> seconds, in the order the stages first ran
+        self.sql_statements = 0
+        self.sql_rows = 0
+
+    def server_timing(self):
+        """The Server-Timing header value; durations are in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ', '.join(entries)
+
+
+# Each request runs on a single thread, so the active RequestStats is thread-local
+_request_local = threading.local()
+
+
+def begin_request_stats():
+    _request_local.stats = RequestStats()
+    return _request_local.stats
+
+
+def end_request_stats():
+    """Detach and return the current request's stats (None if none were started)."""
+    stats = getattr(_request_local, 'stats', None)
+    _request_local.stats = None
+    return stats
+
+
+def count_sql_statement(statement):
+    """sqlite3 trace callback: count every statement run on behalf of the current request."""
+    stats = getattr(_request_local, 'stats', None)
+    if stats is not None:
+        stats.sql_statements += 1
+
+
+def count_sql_rows(rows):
+    stats = getattr(_request_local, 'stats', None)
+    if stats is not None:
+        stats.sql_rows += rows
+
+
+@contextmanager
+def timed(stage):
+    """Record how long the enclosed block takes under the given stage label."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage)
+        stats = getattr(_request_local, 'stats', None)
+        if stats is not None:
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + elapsed
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,136 @@
+import re
+import unicodedata
+
+# Instructor names are matched on normalized keys rather than the raw strings, because the
+# search page and the feedback reports write the same person differently: "Müller" vs
+# "Muller", "Al-Hassan" vs "Al Hassan", "Jane A. Doe" vs first "Jane" / last "Doe", and
+# insert_professors in scrapeFeedback.py files middle names under the last name.
+#
+# The same functions build the index (analyzeCourseFeedback/build_name_index.py, or the
+# snapshot when the table is missing) and normalize the incoming instructor strings, so
+# every lookup is one exact probe per department and key.
+#
+# Folding makes different spellings collide ("García" and "Garcia" both become "garcia"),
+# so a name is looked up twice: first by its spelling (exact_name), which is how names
+# were matched before any folding, and only if that finds no one by its folded key.
+
+# Key ranks; when two professors in a department produce the same key the lower rank wins,
+# then the lower id. The last name as spelled ranks first, so within a department a name
+# that matched a professor exactly before still matches that professor, and folding only
+# decides between spellings exact matching can't tell apart.
+EXACT_LAST_NAME = 0  # "garcía", "al-hassan": case folded, accents and punctuation kept
+LAST_NAME = 1        # "garcia", "al hassan", "de la cruz"
+FULL_NAME = 2        # "jane doe"
+PARTIAL_NAME = 3     # trailing parts of a multi-part last name, and first name + final part
+
+_SEPARATORS = re.compile(r"[-‐‑‒–—_/]+")
+_DROPPED = re.compile(r"[^\w\s]")
+
+
+def normalize_name(name):
+    """
+    Fold a name to its lookup key.
+
+    Case and accents are folded, hyphens become spaces, other punctuation is dropped and
+    single-letter initials are removed (unless the name is nothing but an initial).
+    """
+    if not name:
+        return ''
+    folded = unicodedata.normalize('NFKD', name)
+    folded = ''.join(char for char in folded if not unicodedata.combining(char)).casefold()
+    folded = _DROPPED.sub('', _SEPARATORS.sub(' ', folded))
+    parts = folded.split()
+    if len(parts) > 1:
+        parts = [part for part in parts if len(part) > 1] or parts
+    return ' '.join(parts)
+
+
+def exact_name(name):
+    """The name as spelled, with only case and whitespace folded."""
+    if not name:
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', name).casefold().split())
+
+
+def lookup_names(name):
+    """
+    The keys to look a name up under, in order: its spelling, then its folded key.
+
+    Returns:
+        tuple: One key when folding doesn't change the name, otherwise two; empty for a
+        blank name.
+    """
+    return tuple(dict.fromkeys(key for key in (exact_name(name), normalize_name(name)) if key))
+
+
+def professor_name_keys(first_name, last_name):
+    """
+    Every key a professor can be found under, as (key, rank) pairs.
+
+    Args:
+        first_name (str): first_name as stored by insert_professors (may be empty).
+        last_name (str): last_name as stored by insert_professors (may hold several words).
+
+    Returns:
+        list: (key, rank) tuples without duplicate keys, best rank first.
+    """
+    last = normalize_name(last_name)
+    first = normalize_name(first_name)
+    keys = {}
+
+    def add(key, rank):
+        if key and (key not in keys or rank < keys[key]):
+            keys[key] = rank
+
+    add(exact_name(last_name), EXACT_LAST_NAME)
+    add(last, LAST_NAME)
+    if first:
+        add(normalize_name(f"{first_name} {last_name}"), FULL_NAME)
+
+    parts = last.split()
+    for start in range(1, len(parts)):
+        add(' '.join(parts[start:]), PARTIAL_NAME)
+    if first and len(parts) > 1:
+        add(f"{first.split()[0]} {parts[-1]}", PARTIAL_NAME)
+
+    return sorted(keys.items(), key=lambda item: item[1])
+
+
+def build_name_index(professors):
+    """
+    Map (key, dept) to the single professor id a lookup should return.
+
+    Args:
+        professors (iterable): (id, first_name, last_name, dept) tuples.
+
+    Returns:
+        dict: (key, dept) -> professor id, keeping the best (rank, id) per key.
+    """
+    best = {}
+    for professor_id, first_name, last_name, dept in professors:
+        for key, rank in professor_name_keys(first_name, last_name):
+            candidate = (rank, professor_id)
+            current = best.get((key, dept))
+            if current is None or candidate < current:
+                best[(key, dept)] = candidate
+    return {key: professor_id for key, (_, professor_id) in best.items()}
+
+
+def find_professor_id(professor_ids, names, departments):
+    """
+    Return the professor's ID for the first key, then the first department (in priority
+    order), they are found under.
+
+    Args:
+        professor_ids (dict): (key, dept) -> professor id, from build_name_index.
+        names (tuple): Keys from lookup_names, or a single key as a str.
+        departments (list): Departments in priority order.
+    """
+    if isinstance(names, str):
+        names = (names,)
+    for name in names:
+        for dept in departments:
+            professor_id = professor_ids.get((name, dept))
+            if professor_id:
+                return professor_id
+    return None
@@ -0,0 +1,176 @@
+import gzip
+import json
+import os
+import threading
+from collections import namedtuple
+from compact_store import DEPT, INT, CompactNameIndex, CompactTable, DeptCodes
+from name_keys import find_professor_id
+from response_cache import LRUCache
+
+# The /prefetch endpoint sends a department's (or a term's) resolved feedback in one
+# response, so the extension can fill a local cache once per session instead of posting
+# every search page. The body is NDJSON: a header line, then one line per course:
+#
+#   {"version": "...", "term": "Autumn", "departments": ["ECON", ...]}
+#   {"courseId": "ECON 20000", "course_rating": 4.1, "course_hours": 9.5,
+#    "instructors": [{"names": ["doe", "jane doe"], "professor_rating": 4.3,
+#                     "professor_course_rating": 4.2, "professor_course_hours": 9.0}]}
+#
+# "names" are the name keys that resolve to that instructor for the course. The extension
+# matches an instructor string the way the backend does: the keys from
+# name_keys.lookup_names (its spelling, then its folded key), first one found wins.
+# A row's numbers are what /get-course-feedback returns when the row has just that instructor.
+#
+# Each department is compressed once per database version into its own gzip member, and
+# the response is those members back to back (which is itself a valid gzip stream), so a
+# cached department is never compressed again and the response streams as it is read.
+
+PREFETCH_CACHE_SIZE = int(os.environ.get('FEEDBACK_PREFETCH_CACHE_SIZE', '512'))
+GZIP_LEVEL = 6
+
+# (dept, term) -> gzip member with that department's lines
+department_cache = LRUCache(PREFETCH_CACHE_SIZE)
+
+# term -> set of (dept, course_id) with feedback from that term
+term_cache = LRUCache(64)
+
+# Everything the lines are built from, as compact_store tables keyed department first, so
+# one department's entries are a single prefix_keys range. Built once per snapshot; about
+# 8 bytes per entry whether the snapshot holds dicts or compact tables.
+#   courses:   (dept, course_id) with feedback, or aliased to a course with feedback
+#   teaching:  (dept, course_id, professor_id) with professor-course stats
+#   name_keys: (dept, professor_id, position) for every professor_ids entry that finds that
+#              professor in that department; key_at(position) is the entry's (name key, dept)
+PrefetchIndex = namedtuple('PrefetchIndex', ['courses', 'teaching', 'name_keys', 'key_at'])
+
+_index = None  # (version, PrefetchIndex)
+_index_lock = threading.Lock()
+
+
+def prefetch_index(version, lookups):
+    """The PrefetchIndex for a snapshot, built on first use and kept until the version changes."""
+    global _index
+    current = _index
+    if current is not None and current[0] == version:
+        return current[1]
+
+    with _index_lock:
+        if _index is None or _index[0] != version:
+            depts = DeptCodes()
+            course_keys = list(lookups.course_stats) + list(lookups.course_aliases or ())
+            courses = CompactTable(course_keys, (DEPT, INT), (), depts)
+            del course_keys
+            teaching = CompactTable(
+                ((dept, course_id, professor_id) for professor_id, dept, course_id in lookups.professor_course_stats),
+                (DEPT, INT, INT), (), depts
+            )
+            professor_ids = lookups.professor_ids
+            name_keys = CompactTable(
+                ((dept, professor_id, position) for position, ((_, dept), professor_id) in enumerate(professor_ids.items())),
+                (DEPT, INT, INT), (), depts
+            )
+            # The compact index reads an entry by position; a dict needs its keys in a list
+            key_at = professor_ids.key_at if isinstance(professor_ids, CompactNameIndex) else list(professor_ids).__getitem__
+            _index = (version, PrefetchIndex(courses, teaching, name_keys, key_at))
+        return _index[1]
+
+
+def term_departments(lookups, index, term_courses):
+    """Departments with a course (or a cross-listing of one) in term_courses, sorted."""
+    aliases = lookups.course_aliases or {}
+    departments = set()
+    for course_key in index.courses:
+        if course_key[0] not in departments and aliases.get(course_key, course_key) in term_courses:
+            departments.add(course_key[0])
+    return sorted(departments)
+
+
+def indexed_names(index, professor_id, dept):
+    """The name keys professor_ids has for professor_id in dept."""
+    return [index.key_at(position)[0] for _, _, position in index.name_keys.prefix_keys((dept, professor_id))]
+
+
+def course_line(lookups, index, dept, course_id):
+    """
+    Resolved feedback for one course and every instructor we have feedback for.
+
+    Returns:
+        dict: One NDJSON line (see the top of this file).
+    """
+    course_key = (dept, course_id)
+    departments = [dept]
+    if lookups.course_aliases is not None:
+        course_key = lookups.course_aliases.get(course_key, course_key)
+        if course_key[0] != dept:
+            departments.append(course_key[0])
+    course_rating, course_hours = lookups.course_stats.get(course_key, (None, None))
+
+    instructors = []
+    for _, _, professor_id in index.teaching.prefix_keys(course_key):
+        names = sorted({
+            name_key
+            for name_dept in departments
+            for name_key in indexed_names(index, professor_id, name_dept)
+            if find_professor_id(lookups.professor_ids, name_key, departments) == professor_id
+        })
+        if not names:
+            continue
+        prof_course_rating, prof_course_hours = lookups.professor_course_stats.get((professor_id,) + course_key)
+        instructors.append({
+            'names': names,
+            'professor_rating': lookups.professor_ratings.get(professor_id),
+            'professor_course_rating': prof_course_rating,
+            'professor_course_hours': prof_course_hours,
+        })
+
+    return {
+        'courseId': f"{dept} {course_id}",
+        'course_rating': course_rating,
+        'course_hours': course_hours,
+        'instructors': instructors,
+    }
+
+
+def ndjson_member(lines):
+    """Encode lines as NDJSON in a single gzip member (mtime=0 so the bytes are reproducible)."""
+    raw = ''.join(json.dumps(line, separators=(',', ':')) + '\n' for line in lines)
+    return gzip.compress(raw.encode('utf-8'), compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def department_member(version, lookups, dept, term=None, term_courses=None):
+    """
+    One department's lines as a gzip member, compressed once per version.
+
+    Args:
+        version (str): Snapshot version; cached members are dropped when it changes.
+        lookups (FeedbackLookups): The in-memory snapshot.
+        dept (str): Department code.
+        term (str): The term the courses were filtered to, or None for all of them.
+        term_courses (set): (dept, course_id) offered in that term, required with term.
+            A cross-listing counts when the course its feedback is stored under does.
+
+    Returns:
+        bytes: The gzip member (empty-bodied if the department has no courses).
+    """
+    member = department_cache.get((dept, term), version)
+    if member is not None:
+        return member
+
+    index = prefetch_index(version, lookups)
+    aliases = lookups.course_aliases or {}
+    lines = []
+    for _, course_id in index.courses.prefix_keys((dept,)):
+        if term_courses is not None and aliases.get((dept, course_id), (dept, course_id)) not in term_courses:
+            continue
+        lines.append(course_line(lookups, index, dept, course_id))
+
+    member = ndjson_member(lines)
+    department_cache.put((dept, term), member, version)
+    return member
+
+
+def prefetch_stream(version, lookups, departments, term=None, term_courses=None):
+    """Yield the header member and then each department's member."""
+    yield ndjson_member([{'version': version, 'term': term, 'departments': departments}])
+    for dept in departments:
+        yield department_member(version, lookups, dept, term, term_courses)
@@ -0,0 +1,85 @@
+from collections import namedtuple
+from name_keys import lookup_names
+
+# One parsed row of the search page.
+#   index:            position of the row in the payload
+#   course_name:      the courseId string as sent by the extension
+#   dept, course_id:  the parsed primary listing (course_id is an int)
+#   listings:         parseable cross-listings as (listing, dept, course_id), in page order
+#   departments:      [dept] followed by the department of every cross-listing, used to
+#                     pick which department a professor's last name is looked up in
+#   professor_names:  instructor names split on commas, each as the tuple of name keys to try
+#                     (name_keys.lookup_names)
+RowPlan = namedtuple('RowPlan', ['index', 'course_name', 'dept', 'course_id', 'listings', 'departments', 'professor_names'])
+
+# The whole request, parsed once.
+#   rows:            RowPlan for every row with a usable primary listing
+#   course_keys:     every (dept, course_id) that needs course data, including cross-listings
+#   professor_keys:  (name keys, departments) for every instructor, in page order
+RequestPlan = namedtuple('RequestPlan', ['rows', 'course_keys', 'professor_keys'])
+
+
+def split_course_name(course_name):
+    """Split a course name like 'ECON 20000' into its department and course number strings."""
+    try:
+        dept, course_id = course_name.strip().split()
+        return dept.strip(), course_id.strip()
+    except ValueError:
+        # Return None if the format is unexpected
+        return None, None
+
+
+def parse_course_key(course_name):
+    """Return (dept, course_id) with an integer course_id, or (None, None) if it can't be parsed."""
+    dept, course_id = split_course_name(course_name)
+    if not dept or not course_id:
+        return None, None
+    try:
+        return dept, int(course_id)
+    except ValueError:
+        return dept, None
+
+
+def plan_request(data):
+    """
+    Parse the extension's payload once into a RequestPlan.
+
+    Every later stage (bulk lookups and response assembly) reads the plan instead of
+    re-splitting course names, listings and instructor strings.
+
+    Args:
+        data (list): The courses sent by the extension, each with courseId, instructor
+            and otherListings.
+
+    Returns:
+        RequestPlan: The parsed rows plus the de-duplicated keys to look up.
+    """
+    rows = []
+    course_keys = set()
+    professor_keys = []
+
+    for index, course in enumerate(data):
+        course_name = course['courseId']
+        dept, course_id = parse_course_key(course_name)
+        if not dept or not course_id:
+            continue
+
+        listings = []
+        departments = [dept]
+        for listing in course['otherListings']:
+            alt_dept, alt_course_id = parse_course_key(listing)
+            if not alt_dept:
+                continue
+            departments.append(alt_dept)
+            if alt_course_id:
+                listings.append((listing, alt_dept, alt_course_id))
+                course_keys.add((alt_dept, alt_course_id))
+
+        course_keys.add((dept, course_id))
+        professor_names = [lookup_names(name) for name in course['instructor'].split(',')]
+        for names in professor_names:
+            professor_keys.append((names, departments))
+
+        rows.append(RowPlan(index, course_name, dept, course_id, listings, departments, professor_names))
+
+    return RequestPlan(rows, course_keys, professor_keys)
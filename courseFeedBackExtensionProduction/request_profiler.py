@@ -0,0 +1,91 @@
+import cProfile
+import hmac
+import itertools
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+
+# Profile 1 in every PROFILE_SAMPLE_RATE requests (0 turns sampling off). A request can
+# also ask to be profiled with the X-Profile header if it carries the debug token.
+PROFILE_SAMPLE_RATE = int(os.environ.get('FEEDBACK_PROFILE_SAMPLE_RATE', '0'))
+
+# Shared secret for /debug/profile and the X-Profile header. Unset disables both.
+DEBUG_TOKEN = os.environ.get('FEEDBACK_DEBUG_TOKEN', '')
+
+# Where dump_profile writes .prof files
+PROFILE_DIR = os.environ.get('FEEDBACK_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+_request_counter = itertools.count()
+_stats = None
+_profiled_requests = 0
+_stats_lock = threading.Lock()
+
+
+def token_is_valid(token):
+    """True if a debug token is configured and token matches it."""
+    return bool(DEBUG_TOKEN) and token is not None and hmac.compare_digest(token, DEBUG_TOKEN)
+
+
+def should_profile(headers):
+    """Decide whether the current request is profiled: explicitly requested, or sampled."""
+    if headers.get('X-Profile') and token_is_valid(headers.get('X-Debug-Token')):
+        return True
+    if PROFILE_SAMPLE_RATE <= 0:
+        return False
+    return next(_request_counter) % PROFILE_SAMPLE_RATE == 0
+
+
+@contextmanager
+def profiled(enabled):
+    """Profile the enclosed block if enabled and fold the result into the aggregate stats."""
+    if not enabled:
+        yield
+        return
+
+    global _stats, _profiled_requests
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _stats_lock:
+            if _stats is None:
+                _stats = pstats.Stats(profiler)
+            else:
+                _stats.add(profiler)
+            _profiled_requests += 1
+
+
+def profile_report(sort='cumtime', limit=50):
+    """Render the aggregated stats as text."""
+    with _stats_lock:
+        if _stats is None:
+            return "No requests have been profiled yet.\n"
+        s = StringIO()
+        _stats.stream = s
+        s.write(f"Profiled requests: {_profiled_requests}\n")
+        _stats.sort_stats(sort).print_stats(limit)
+        return s.getvalue()
+
+
+def dump_profile():
+    """Write the aggregated stats to a .prof file (readable with pstats or snakeviz) and return its path."""
+    with _stats_lock:
+        if _stats is None:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"feedback-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        _stats.dump_stats(path)
+        return path
+
+
+def reset_profile():
+    """Discard the aggregated stats."""
+    global _stats, _profiled_requests
+    with _stats_lock:
+        _stats = None
+        _profiled_requests = 0
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from metrics import GaugeCallback
+
+# Number of whole search pages and of individual rows kept per worker
+PAGE_CACHE_SIZE = int(os.environ.get('FEEDBACK_PAGE_CACHE_SIZE', '1024'))
+ROW_CACHE_SIZE = int(os.environ.get('FEEDBACK_ROW_CACHE_SIZE', '20000'))
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded LRU cache tied to a database version.
+
+    Every get/put carries the version of the data the value was computed from. When a
+    new version is seen the cache is emptied, so nothing computed from an older
+    course_feedback.db is ever served.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        """Return the cached value for key, or None."""
+        with self._lock:
+            self._check_version(version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        with self._lock:
+            # A value computed from a version that has since been replaced is dropped
+            if version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self.version,
+            }
+
+
+page_cache = LRUCache(PAGE_CACHE_SIZE)
+row_cache = LRUCache(ROW_CACHE_SIZE)
+# page key -> compression.EncodedBody: the serialized page and its gzip/br forms
+body_cache = LRUCache(PAGE_CACHE_SIZE)
+
+_caches = (('page', page_cache), ('row', row_cache), ('body', body_cache))
+GaugeCallback('feedback_cache_hits_total', 'Response cache hits.', ['cache'],
+              lambda: [((name,), cache.hits) for name, cache in _caches], metric_type='counter')
+GaugeCallback('feedback_cache_misses_total', 'Response cache misses.', ['cache'],
+              lambda: [((name,), cache.misses) for name, cache in _caches], metric_type='counter')
+GaugeCallback('feedback_cache_entries', 'Entries currently held in each response cache.', ['cache'],
+              lambda: [((name,), len(cache._entries)) for name, cache in _caches])
+
+
+def row_cache_key(course):
+    """Key for a single search-page row: everything the row's feedback depends on."""
+    return (course['courseId'], course['instructor'], tuple(course['otherListings']))
+
+
+def page_cache_key(data):
+    """Canonical hash of a whole payload's (courseId, instructor, otherListings) tuples."""
+    canonical = json.dumps(
+        [[course['courseId'], course['instructor'], course['otherListings']] for course in data],
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
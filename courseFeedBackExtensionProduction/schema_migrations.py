@@ -0,0 +1,174 @@
+import sqlite3
+
+# course_feedback.db carries its schema version in PRAGMA user_version. Every change to the
+# tables or indexes is a new entry at the end of MIGRATIONS (never edit an old one), and
+# migrate() applies whatever a database hasn't had yet, so scrapeFeedback.py,
+# calculate_averages.py and the backend all agree on which columns exist instead of each
+# adding them as they go.
+#
+# Databases from before this module report version 0. The migrations are written so they
+# are safe to run on those (tables and columns that are already there are left alone).
+
+RATING_COLUMNS = [
+    'challenge_intellect', 'purpose', 'standards', 'feedback', 'fairness', 'respect', 'excellence',
+    'organization', 'challenge', 'available', 'inclusive', 'significant',
+]
+HOUR_COLUMNS = [
+    'less_five', 'five_to_ten', 'ten_to_fifteen', 'fifteen_to_twenty', 'twenty_to_twenty_five',
+    'twenty_five_to_thirty', 'more_thirty',
+]
+
+# Filled in by calculate_averages.py before it had the serving tables (see create_serving_tables)
+AVERAGE_COLUMNS = {
+    'courses_professors': ['avg_prof_course_hours', 'avg_prof_course_rating'],
+    'courses': ['avg_course_hours', 'avg_course_rating'],
+    'professors': ['avg_professor_rating'],
+}
+
+
+def create_tables(cursor):
+    """The tables as scrapeFeedback.py fills them."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dept TEXT,
+            quarter TEXT,
+            course_id INTEGER,
+            {', '.join(f'{column} REAL' for column in RATING_COLUMNS + HOUR_COLUMNS)},
+            url TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS professors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dept TEXT,
+            first_name TEXT,
+            last_name TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS courses_professors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER,
+            professor_id INTEGER
+        )
+    """)
+
+
+def add_average_columns(cursor):
+    """The per-row average columns older databases were served from (some may be there already)."""
+    for table, columns in AVERAGE_COLUMNS.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column in columns:
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL")
+
+
+def create_serving_indexes(cursor):
+    """Indexes on the columns the backend, the scraper and the averages filter and join on."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_courses_dept_course_id ON courses(dept, course_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_courses_url ON courses(url)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_professors_last_name_dept ON professors(last_name, dept)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_courses_professors_professor_course ON courses_professors(professor_id, course_id)")
+
+
+def create_serving_tables(cursor):
+    """
+    One row per lookup key, filled by calculate_averages.py and read by the backend, instead
+    of the averages copied onto every courses / professors / courses_professors row.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS course_stats (
+            dept TEXT NOT NULL,
+            course_id INTEGER NOT NULL,
+            avg_course_rating REAL,
+            avg_course_hours REAL,
+            PRIMARY KEY (dept, course_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS professor_stats (
+            professor_id INTEGER NOT NULL PRIMARY KEY,
+            avg_professor_rating REAL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prof_course_stats (
+            professor_id INTEGER NOT NULL,
+            dept TEXT NOT NULL,
+            course_id INTEGER NOT NULL,
+            avg_prof_course_rating REAL,
+            avg_prof_course_hours REAL,
+            PRIMARY KEY (professor_id, dept, course_id)
+        ) WITHOUT ROWID
+    """)
+
+
+# (name, function) pairs; a database at version N has had the first N applied
+MIGRATIONS = [
+    ('create_tables', create_tables),
+    ('add_average_columns', add_average_columns),
+    ('create_serving_indexes', create_serving_indexes),
+    ('create_serving_tables', create_serving_tables),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Bring a database up to SCHEMA_VERSION.
+
+    Each migration runs in its own transaction together with the user_version bump, so an
+    interrupted run picks up where it stopped. When anything was applied the query planner
+    statistics are refreshed with ANALYZE.
+
+    Args:
+        conn (sqlite3.Connection): A writable connection to course_feedback.db.
+
+    Returns:
+        list: Names of the migrations that were applied.
+
+    Raises:
+        sqlite3.DatabaseError: The database is newer than this code.
+    """
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {version} is newer than this code ({SCHEMA_VERSION}); pull the latest code."
+        )
+
+    applied = []
+    for number, (name, migration) in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN TRANSACTION;')
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        applied.append(name)
+
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
+
+def schema_warning(conn):
+    """A message if the database isn't at the version this code expects, otherwise None."""
+    version = schema_version(conn)
+    if version < SCHEMA_VERSION:
+        return f"Database schema version {version} is older than {SCHEMA_VERSION}; run calculate_averages.py on it."
+    if version > SCHEMA_VERSION:
+        return f"Database schema version {version} is newer than this code ({SCHEMA_VERSION}); pull the latest code."
+    return None
@@ -0,0 +1,119 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from compact_store import CompactNameIndex, CompactTable, DeptCodes
+
+# A snapshot file is the compact_store tables of one database version written out as raw
+# arrays, so a worker can mmap it instead of reading the database into memory. Every worker
+# process maps the same file read-only and shares one copy in the page cache, and opening
+# it is a header parse: the arrays are read straight out of the mapping, with no copy.
+#
+# publish_database.py writes course_feedback.<version>.snapshot next to each versioned
+# database; feedback_snapshot.active_snapshot maps it when it's there and falls back to
+# loading the database when it isn't (or was written for a different version).
+#
+# Layout (native byte order, which the header records):
+#   MAGIC, then the header's offset as a little-endian uint64
+#   each array's bytes, 8-byte aligned
+#   a JSON header: version, byte order, department codes and, per FeedbackLookups field,
+#   the table's layout() parameters plus [offset, length, format] for each of its arrays
+
+MAGIC = b'CFSNAP01'
+ALIGNMENT = 8
+
+
+def snapshot_file_path(db_path):
+    """course_feedback.<version>.db -> course_feedback.<version>.snapshot"""
+    return os.path.splitext(db_path)[0] + '.snapshot'
+
+
+def _write_array(f, values):
+    padding = -f.tell() % ALIGNMENT
+    f.write(b'\0' * padding)
+    view = memoryview(values)
+    offset = f.tell()
+    f.write(view.cast('B'))
+    return [offset, len(view), view.format]
+
+
+def write_snapshot_file(lookups, path, version):
+    """
+    Write compact lookups to path, replacing it atomically.
+
+    Args:
+        lookups (FeedbackLookups): From feedback_snapshot.load_snapshot(db_path, compact=True).
+        path (str): Destination, normally snapshot_file_path(db_path).
+        version (str): The database version the lookups were loaded from.
+    """
+    depts = None
+    tables = {}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + bytes(8))
+        for field, table in lookups._asdict().items():
+            if table is None:
+                tables[field] = None
+                continue
+            depts = table.depts
+            params, arrays = table.layout()
+            tables[field] = dict(params, arrays=[_write_array(f, values) for values in arrays])
+
+        header_offset = f.tell()
+        f.write(json.dumps({
+            'version': version,
+            'byteorder': sys.byteorder,
+            'depts': depts.codes if depts is not None else [],
+            'tables': tables,
+        }).encode('utf-8'))
+        f.seek(len(MAGIC))
+        f.write(struct.pack('<Q', header_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def map_snapshot_file(path, version):
+    """
+    Map a snapshot file written by write_snapshot_file.
+
+    Args:
+        path (str): The snapshot file.
+        version (str): The version the caller is serving.
+
+    Returns:
+        dict: FeedbackLookups field -> table reading from the mapping (None for a table the
+        database didn't have), or None if the file is missing or was written for another
+        version or machine.
+
+    Raises:
+        ValueError: The file isn't a snapshot file.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    if mapping[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"'{path}' is not a snapshot file")
+    header_offset, = struct.unpack('<Q', mapping[len(MAGIC):len(MAGIC) + 8])
+    header = json.loads(mapping[header_offset:])
+    if header['version'] != version or header['byteorder'] != sys.byteorder:
+        return None
+
+    view = memoryview(mapping)
+    depts = DeptCodes(header['depts'])
+    tables = {}
+    for field, params in header['tables'].items():
+        if params is None:
+            tables[field] = None
+            continue
+        arrays = [
+            view[offset:offset + length * struct.calcsize(fmt)].cast(fmt)
+            for offset, length, fmt in params['arrays']
+        ]
+        table_class = CompactNameIndex if params['kind'] == 'names' else CompactTable
+        tables[field] = table_class.from_layout(params, arrays, depts)
+    return tables
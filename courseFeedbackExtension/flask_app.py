@@ -6,7 +6,7 @@ import pstats
 from io import StringIO
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-SQL-Statements'])
 
 # Path to your course_feedback database
 DB_PATH = '/home/benheim/courseFeedback/courseFeedBackExtensionProduction/course_feedback.db'
@@ -39,7 +39,7 @@ def find_professor_id(cursor, last_name, dept):
 def calculate_course_rating(cursor, dept, course_id):
     # Columns for course rating
     # Query to get all the course feedback for the given course
-    query = f"SELECT avg_course_rating FROM courses WHERE dept = ? AND course_id = ?"
+    query = f"SELECT avg_course_rating FROM course_stats WHERE dept = ? AND course_id = ?"
     cursor.execute(query, (dept, course_id))
     results = cursor.fetchone()
     # If no results, return None
@@ -59,7 +59,7 @@ def calculate_course_ratings(cursor, courses):
     # Query to fetch all rows for the given courses
     query = f"""
         SELECT dept, course_id, avg_course_rating
-        FROM courses
+        FROM course_stats
         WHERE {where_clause}
     """
 
@@ -121,7 +121,7 @@ def calculate_courses_hours(cursor, courses):
     # Query to fetch all rows for the given courses
     query = f"""
         SELECT dept, course_id, avg_course_hours
-        FROM courses
+        FROM course_stats
         WHERE {where_clause}
     """
 
@@ -254,6 +254,9 @@ def get_course_feedback():
     feedback_data = []
 
     conn = sqlite3.connect(DB_PATH)
+    # Count every statement so per-row queries (N+1) show up in the X-SQL-Statements header
+    sql_statements = []
+    conn.set_trace_callback(sql_statements.append)
     cursor = conn.cursor()
 
     try:
@@ -360,7 +363,7 @@ def get_course_feedback():
             })
 
         # Return the feedback data as JSON
-        return jsonify(feedback_data), 200
+        return jsonify(feedback_data), 200, {'X-SQL-Statements': str(len(sql_statements))}
 
     finally:
         # Close the database connection after all processing is complete
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The backend is a folder of sibling modules, imported the way flask_app.py imports them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'courseFeedBackExtensionProduction'))
+
+from name_keys import build_name_index  # noqa: E402
+from schema_migrations import migrate  # noqa: E402
+
+# A few departments' worth of feedback, small enough to work the answers out by hand.
+#   ECON 23000 / PPHA 30000 / PUBP 31000 are one cross-listed course, with its feedback
+#   saved under PPHA 30000. Only ECON 23000 is in course_aliases (PUBP 31000 is a
+#   cross-listing the link scrape missed).
+#   ECON has a García and a Garcia, and there is a Doe in both ECON and MATH.
+
+# (id, dept, quarter, course_id, avg_course_rating, avg_course_hours)
+COURSES = [
+    (1, 'ECON', 'Autumn 2023', 20000, 4.0, 10.0),
+    (2, 'ECON', 'Winter 2024', 20100, 3.5, 8.0),
+    (3, 'PPHA', 'Autumn 2023', 30000, 4.5, 6.0),
+    (4, 'MATH', 'Spring 2024', 15300, 3.0, 12.0),
+]
+
+# (id, dept, first_name, last_name, avg_professor_rating)
+PROFESSORS = [
+    (1, 'ECON', 'Jane', 'Doe', 4.2),
+    (2, 'ECON', 'Ana', 'García', 3.9),
+    (3, 'ECON', 'Bob', 'Garcia', 4.4),
+    (4, 'PPHA', 'Maria', 'Lopez', 4.8),
+    (5, 'MATH', 'John', 'Doe', 3.1),
+]
+
+# (professor_id, courses.id, avg_prof_course_rating, avg_prof_course_hours)
+COURSES_PROFESSORS = [
+    (1, 1, 4.1, 9.0),
+    (2, 2, 3.8, 7.5),
+    (3, 2, 4.3, 8.5),
+    (4, 3, 4.7, 5.5),
+    (5, 4, 2.9, 11.0),
+]
+
+# (dept, course_id, canonical_dept, canonical_course_id)
+COURSE_ALIASES = [
+    ('ECON', 23000, 'PPHA', 30000),
+]
+
+
+def create_feedback_db(path, aliases=True, name_keys=False):
+    """
+    Write the fixture data to a new course_feedback.db at path.
+
+    Both the serving tables and the old avg_* columns are filled, with the same numbers.
+    professor_name_keys is only written with name_keys (the backend indexes names itself
+    without it).
+    """
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO courses (id, dept, quarter, course_id, avg_course_rating, avg_course_hours) VALUES (?, ?, ?, ?, ?, ?)",
+        COURSES
+    )
+    conn.executemany(
+        "INSERT INTO professors (id, dept, first_name, last_name, avg_professor_rating) VALUES (?, ?, ?, ?, ?)",
+        PROFESSORS
+    )
+    conn.executemany(
+        "INSERT INTO courses_professors (professor_id, course_id, avg_prof_course_rating, avg_prof_course_hours) VALUES (?, ?, ?, ?)",
+        COURSES_PROFESSORS
+    )
+
+    courses = {course[0]: course for course in COURSES}
+    conn.executemany(
+        "INSERT INTO course_stats VALUES (?, ?, ?, ?)",
+        [(dept, course_id, rating, hours) for _, dept, _, course_id, rating, hours in COURSES]
+    )
+    conn.executemany(
+        "INSERT INTO professor_stats VALUES (?, ?)",
+        [(professor_id, rating) for professor_id, _, _, _, rating in PROFESSORS]
+    )
+    conn.executemany(
+        "INSERT INTO prof_course_stats VALUES (?, ?, ?, ?, ?)",
+        [
+            (professor_id, courses[course][1], courses[course][3], rating, hours)
+            for professor_id, course, rating, hours in COURSES_PROFESSORS
+        ]
+    )
+
+    if aliases:
+        conn.execute("""
+            CREATE TABLE course_aliases (
+                dept TEXT NOT NULL,
+                course_id INTEGER NOT NULL,
+                canonical_dept TEXT NOT NULL,
+                canonical_course_id INTEGER NOT NULL,
+                PRIMARY KEY (dept, course_id)
+            ) WITHOUT ROWID
+        """)
+        conn.executemany("INSERT INTO course_aliases VALUES (?, ?, ?, ?)", COURSE_ALIASES)
+    if name_keys:
+        # What analyzeCourseFeedback/build_name_index.py writes
+        conn.execute("""
+            CREATE TABLE professor_name_keys (
+                name_key TEXT NOT NULL,
+                dept TEXT NOT NULL,
+                professor_id INTEGER NOT NULL,
+                PRIMARY KEY (name_key, dept)
+            ) WITHOUT ROWID
+        """)
+        index = build_name_index(
+            (professor_id, first_name, last_name, dept) for professor_id, dept, first_name, last_name, _ in PROFESSORS
+        )
+        conn.executemany(
+            "INSERT INTO professor_name_keys VALUES (?, ?, ?)",
+            [(key, dept, professor_id) for (key, dept), professor_id in index.items()]
+        )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def feedback_db(tmp_path):
+    return create_feedback_db(str(tmp_path / 'course_feedback.db'))
+
+
+@pytest.fixture
+def feedback_db_without_aliases(tmp_path):
+    return create_feedback_db(str(tmp_path / 'course_feedback_without_aliases.db'), aliases=False)
+
+
+@pytest.fixture
+def feedback_db_with_name_keys(tmp_path):
+    return create_feedback_db(str(tmp_path / 'course_feedback_with_name_keys.db'), name_keys=True)
@@ -0,0 +1,108 @@
+import math
+
+import pytest
+
+from compact_store import DEPT, FLOAT, INT, NAME, CompactNameIndex, CompactTable, DeptCodes, build_table
+
+COURSE_ROWS = [
+    ('ECON', 20000, 4.0, 10.0),
+    ('PPHA', 30000, 4.5, None),
+    ('MATH', 15300, None, None),
+    ('ECON', 0, 1.5, 2.5),
+]
+
+
+def test_round_trip_matches_dict():
+    plain = build_table(COURSE_ROWS, (DEPT, INT), (FLOAT, FLOAT))
+    compact = build_table(COURSE_ROWS, (DEPT, INT), (FLOAT, FLOAT), DeptCodes())
+    assert isinstance(compact, CompactTable)
+    assert len(compact) == len(plain)
+    assert dict(compact.items()) == plain
+    assert sorted(compact) == sorted(plain)
+    for key, value in plain.items():
+        assert compact[key] == value
+        assert compact.get(key) == value
+        assert key in compact
+
+
+def test_int_and_dept_values():
+    depts = DeptCodes()
+    aliases = build_table([('ECON', 23000, 'PPHA', 30000), ('PUBP', 31000, 'PPHA', 30000)], (DEPT, INT), (DEPT, INT), depts)
+    ratings = build_table([(5, 3.1), (1, None), (12, 4.2)], (INT,), (FLOAT,), depts)
+    assert aliases.get(('ECON', 23000)) == ('PPHA', 30000)
+    assert aliases.get(('PUBP', 31000)) == ('PPHA', 30000)
+    assert ratings.get(5) == 3.1
+    assert ratings.get(1) is None and 1 in ratings
+    assert ratings.get(12) == 4.2
+
+
+def test_misses_and_bounds():
+    depts = DeptCodes()
+    table = CompactTable(COURSE_ROWS, (DEPT, INT), (FLOAT, FLOAT), depts)
+    # Interned by a later table, so its code is past this table's department radix
+    CompactTable([('ZOOL', 1, 1.0, 1.0)], (DEPT, INT), (FLOAT, FLOAT), depts)
+    ratings = CompactTable([(5, 3.1)], (INT,), (FLOAT,), depts)
+
+    for key in [
+        ('ECON', 20001), ('ECON', -1), ('ECON', 30001), ('ECON', 10 ** 12), ('HIST', 20000),
+        ('ZOOL', 1), ('ECON', '20000'), ('ECON',), ('ECON', 20000, 1), 'ECON 20000', None,
+    ]:
+        assert table.get(key) is None
+        assert key not in table
+    with pytest.raises(KeyError):
+        table[('HIST', 20000)]
+    for key in [4, 6, -5, 2 ** 70, '5', (5,)]:
+        assert ratings.get(key, 'missing') == 'missing'
+
+
+def test_last_duplicate_wins():
+    table = CompactTable([('ECON', 1, 1.0), ('ECON', 1, 2.0), ('ECON', 2, 3.0)], (DEPT, INT), (FLOAT,), DeptCodes())
+    assert len(table) == 2
+    assert table.get(('ECON', 1)) == 2.0
+
+
+def test_rejects_keys_it_cannot_pack():
+    with pytest.raises(ValueError):
+        CompactTable([('ECON', -1, 1.0)], (DEPT, INT), (FLOAT,), DeptCodes())
+    with pytest.raises(ValueError):
+        CompactTable([(2 ** 40, 2 ** 40, 1.0)], (INT, INT), (FLOAT,), DeptCodes())
+
+
+def test_empty_table():
+    table = CompactTable([], (DEPT, INT), (FLOAT, FLOAT), DeptCodes())
+    assert len(table) == 0
+    assert table.get(('ECON', 1)) is None
+    assert list(table.items()) == []
+
+
+def test_prefix_keys():
+    depts = DeptCodes()
+    table = CompactTable(
+        [('ECON', 20000, 3), ('ECON', 20000, 1), ('ECON', 20100, 2), ('MATH', 15300, 5)], (DEPT, INT, INT), (), depts
+    )
+    assert list(table.prefix_keys(('ECON',))) == [('ECON', 20000, 1), ('ECON', 20000, 3), ('ECON', 20100, 2)]
+    assert list(table.prefix_keys(('ECON', 20000))) == [('ECON', 20000, 1), ('ECON', 20000, 3)]
+    assert list(table.prefix_keys(('MATH', 15300, 5))) == [('MATH', 15300, 5)]
+    assert list(table.prefix_keys(())) == sorted(table)
+    for prefix in [('HIST',), ('ECON', 99999), ('ECON', -1), ('ECON', 20000, 1, 1)]:
+        assert list(table.prefix_keys(prefix)) == []
+
+
+def test_name_index():
+    rows = [('doe', 'ECON', 1), ('doe', 'MATH', 5), ('garcía', 'ECON', 2), ('garcia', 'ECON', 3)]
+    index = build_table(rows, (NAME, DEPT), (INT,), DeptCodes())
+    assert isinstance(index, CompactNameIndex)
+    assert len(index) == 4
+    assert dict(index.items()) == {(name, dept): professor_id for name, dept, professor_id in rows}
+    assert [index.key_at(position) for position in range(len(index))] == list(index)
+    assert index.get(('garcía', 'ECON')) == 2
+    assert index.get(('garcia', 'ECON')) == 3
+    for key in [('doe', 'HIST'), ('smith', 'ECON'), ('doe',), 'doe', (1, 'ECON')]:
+        assert index.get(key) is None
+        assert key not in index
+
+
+def test_nan_is_none():
+    table = CompactTable([('ECON', 1, float('nan'))], (DEPT, INT), (FLOAT,), DeptCodes())
+    assert table.get(('ECON', 1)) is None
+    assert not any(isinstance(value, float) and math.isnan(value) for _, value in table.items())
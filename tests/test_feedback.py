@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+
+import feedback_snapshot
+import flask_app
+from flask_app import build_feedback, query_lookups
+from request_plan import plan_request
+from response_cache import LRUCache
+
+
+def course(course_id, instructor, other_listings=('',)):
+    return {'courseTitle': 't', 'courseId': course_id, 'instructor': instructor, 'otherListings': list(other_listings)}
+
+
+def feedback(course_id, course_rating, course_hours, professor_rating, professor_course_rating, professor_course_hours, dept, number):
+    return {
+        'courseId': course_id,
+        'course_rating': course_rating,
+        'course_hours': course_hours,
+        'professor_rating': professor_rating,
+        'professor_course_rating': professor_course_rating,
+        'professor_course_hours': professor_course_hours,
+        'feedback_urls': f"https://coursefeedback.uchicago.edu/?CourseDepartment={dept}&CourseNumber={number}",
+    }
+
+
+# Each row posted on its own to the original backend (before the snapshot, name keys and
+# aliases) with the fixture database gives these answers
+BASELINE = [
+    (course('ECON 20000', 'Doe'),
+     feedback('ECON 20000', 4.0, 10.0, 4.2, 4.1, 9.0, 'ECON', 20000)),
+    (course('ECON 20100', 'Garcia, García'),
+     feedback('ECON 20100', 3.5, 8.0, 4.15, 4.05, 8.0, 'ECON', 20100)),
+    (course('ECON 20100', 'Garcia'),
+     feedback('ECON 20100', 3.5, 8.0, 4.4, 4.3, 8.5, 'ECON', 20100)),
+    (course('ECON 20100', 'García'),
+     feedback('ECON 20100', 3.5, 8.0, 3.9, 3.8, 7.5, 'ECON', 20100)),
+    (course('ECON 23000', 'Lopez', [' PPHA 30000', ' PUBP 31000', '']),
+     feedback(' PPHA 30000', 4.5, 6.0, 4.8, 4.7, 5.5, 'ECON', 23000)),
+    (course('PUBP 31000', 'Lopez', [' ECON 23000', ' PPHA 30000', '']),
+     feedback(' PPHA 30000', 4.5, 6.0, 4.8, 4.7, 5.5, 'PUBP', 31000)),
+    (course('MATH 15300', 'Doe'),
+     feedback('MATH 15300', 3.0, 12.0, 3.1, 2.9, 11.0, 'MATH', 15300)),
+    (course('MATH 15300', 'Doe', [' ECON 20000']),
+     feedback('MATH 15300', 3.0, 12.0, 3.1, 2.9, 11.0, 'MATH', 15300)),
+]
+
+# The original backend answered these with a 500; now an unknown course gets an empty row
+# and an unparseable one is left out
+UNKNOWN_COURSE = (course('HIST 10100', 'Nobody'), feedback('HIST 10100', None, None, None, None, None, 'HIST', 10100))
+UNPARSEABLE_COURSE = course('ECON', 'Doe')
+
+
+def snapshot_lookups(db_path, mode):
+    if mode == 'sql':
+        return None
+    return feedback_snapshot.load_snapshot(db_path, compact=mode == 'compact')
+
+
+def resolve(db_path, mode, data):
+    """build_feedback for data, from the dict snapshot, the compact snapshot or per-request SQL."""
+    plan = plan_request(data)
+    lookups = snapshot_lookups(db_path, mode)
+    if lookups is None:
+        conn = sqlite3.connect(db_path)
+        try:
+            lookups = query_lookups(conn.cursor(), plan)
+        finally:
+            conn.close()
+    return build_feedback(plan, lookups)
+
+
+@pytest.mark.parametrize('mode', ['dict', 'compact', 'sql'])
+def test_rows_match_baseline(feedback_db, mode):
+    for data, expected in BASELINE + [UNKNOWN_COURSE]:
+        assert resolve(feedback_db, mode, [data]) == [pytest.approx(expected)]
+
+
+@pytest.mark.parametrize('mode', ['dict', 'compact', 'sql'])
+def test_page_matches_rows(feedback_db, mode):
+    """A whole page gets the same answer per row as the rows do on their own."""
+    data = [row for row, _ in BASELINE] + [UNPARSEABLE_COURSE, UNKNOWN_COURSE[0]]
+    expected = [row for _, row in BASELINE] + [UNKNOWN_COURSE[1]]
+    assert resolve(feedback_db, mode, data) == [pytest.approx(row) for row in expected]
+
+
+@pytest.mark.parametrize('mode', ['dict', 'compact', 'sql'])
+def test_aliases_missing_fall_back_to_listings(feedback_db_without_aliases, mode):
+    for data, expected in BASELINE:
+        assert resolve(feedback_db_without_aliases, mode, [data]) == [pytest.approx(expected)]
+
+
+@pytest.mark.parametrize('mode', ['dict', 'compact', 'sql'])
+def test_alias_without_listings(feedback_db, feedback_db_without_aliases, mode):
+    """An aliased course is found even when the page lists no cross-listings; without the alias it isn't."""
+    data = [course('ECON 23000', 'Lopez')]
+    aliased = feedback('PPHA 30000', 4.5, 6.0, None, None, None, 'ECON', 23000)
+    assert resolve(feedback_db, mode, data) == [aliased]
+    assert resolve(feedback_db_without_aliases, mode, data) == [
+        feedback('ECON 23000', None, None, None, None, None, 'ECON', 23000)
+    ]
+
+
+@pytest.mark.parametrize('mode', ['dict', 'compact', 'sql'])
+def test_normalized_instructor_names(feedback_db, mode):
+    data = [course('ECON 20000', 'Jane A. Doe'), course('ECON 20100', 'GARCIA'), course('MATH 15300', 'John Doe')]
+    rows = resolve(feedback_db, mode, data)
+    assert [row['professor_rating'] for row in rows] == [4.2, 4.4, 3.1]
+
+
+def test_endpoint(feedback_db, monkeypatch):
+    monkeypatch.setattr(flask_app, 'DB_PATH', feedback_db)
+    monkeypatch.setattr(feedback_snapshot, '_active', None)
+    client = flask_app.app.test_client()
+
+    data = [row for row, _ in BASELINE] + [UNPARSEABLE_COURSE, UNKNOWN_COURSE[0]]
+    response = client.post('/get-course-feedback', json=data)
+    assert response.status_code == 200
+    assert response.get_json() == [pytest.approx(row) for _, row in BASELINE] + [UNKNOWN_COURSE[1]]
+
+
+@pytest.mark.parametrize('db', ['feedback_db', 'feedback_db_without_aliases', 'feedback_db_with_name_keys'])
+def test_sql_fallback_statements(request, db, monkeypatch):
+    """Without the snapshot a page costs three statements: courses, professors, professor-courses."""
+    def unavailable(db_path):
+        raise sqlite3.OperationalError('snapshot unavailable')
+
+    monkeypatch.setattr(flask_app, 'DB_PATH', request.getfixturevalue(db))
+    monkeypatch.setattr(flask_app, 'active_snapshot', unavailable)
+    # Fresh caches, so the page is resolved even if another test posted it against the same data
+    for cache in ('page_cache', 'row_cache', 'body_cache'):
+        monkeypatch.setattr(flask_app, cache, LRUCache(16))
+    client = flask_app.app.test_client()
+
+    response = client.post('/get-course-feedback', json=[row for row, _ in BASELINE])
+    assert response.status_code == 200
+    assert response.headers['X-SQL-Statements'] == '3'
+    assert response.get_json() == [pytest.approx(row) for _, row in BASELINE]
@@ -0,0 +1,64 @@
+from name_keys import build_name_index, find_professor_id, lookup_names, normalize_name
+
+
+def find(index, name, departments):
+    return find_professor_id(index, lookup_names(name), departments)
+
+
+def test_normalize_name():
+    assert normalize_name('Müller') == 'muller'
+    assert normalize_name('Al-Hassan') == 'al hassan'
+    assert normalize_name('Jane A. Doe') == 'jane doe'
+    assert normalize_name('  DE LA  Cruz ') == 'de la cruz'
+    assert normalize_name('A.') == 'a'
+    assert normalize_name('') == ''
+
+
+def test_lookup_names():
+    assert lookup_names('Doe') == ('doe',)
+    assert lookup_names('García') == ('garcía', 'garcia')
+    assert lookup_names(' ') == ()
+
+
+def test_exact_spelling_beats_accent_folding():
+    for professors in (
+        [(1, 'Ana', 'García', 'ECON'), (2, 'Bob', 'Garcia', 'ECON')],
+        [(1, 'Bob', 'Garcia', 'ECON'), (2, 'Ana', 'García', 'ECON')],
+    ):
+        index = build_name_index(professors)
+        garcia = next(professor_id for professor_id, _, last_name, _ in professors if last_name == 'Garcia')
+        accented = next(professor_id for professor_id, _, last_name, _ in professors if last_name == 'García')
+        assert find(index, 'Garcia', ['ECON']) == garcia
+        assert find(index, 'GARCIA', ['ECON']) == garcia
+        assert find(index, 'García', ['ECON']) == accented
+        assert find(index, 'garcía', ['ECON']) == accented
+
+
+def test_folding_finds_other_spellings():
+    index = build_name_index([(1, 'Ana', 'García', 'ECON'), (2, 'Jan', 'Müller-Lüdenscheidt', 'MATH')])
+    assert find(index, 'Garcia', ['ECON']) == 1
+    assert find(index, 'Muller Ludenscheidt', ['MATH']) == 2
+    assert find(index, 'Ludenscheidt', ['MATH']) == 2
+
+
+def test_last_name_beats_full_and_partial_names():
+    # "doe" is professor 1's last name but only a partial key for professor 2 (lower id)
+    index = build_name_index([(2, 'John', 'Smith Doe', 'ECON'), (1, 'Jane', 'Doe', 'ECON')])
+    assert find(index, 'Doe', ['ECON']) == 1
+    assert find(index, 'Smith Doe', ['ECON']) == 2
+    assert find(index, 'Jane Doe', ['ECON']) == 1
+    assert find(index, 'John Doe', ['ECON']) == 2
+
+
+def test_same_rank_lower_id_wins():
+    index = build_name_index([(7, 'Jane', 'Doe', 'ECON'), (3, 'John', 'Doe', 'ECON')])
+    assert find(index, 'Doe', ['ECON']) == 3
+    assert find(index, 'Jane Doe', ['ECON']) == 7
+
+
+def test_department_priority():
+    index = build_name_index([(1, 'Jane', 'Doe', 'ECON'), (2, 'John', 'Doe', 'MATH')])
+    assert find(index, 'Doe', ['MATH', 'ECON']) == 2
+    assert find(index, 'Doe', ['ECON', 'MATH']) == 1
+    assert find(index, 'Doe', ['HIST']) is None
+    assert find(index, '', ['ECON']) is None
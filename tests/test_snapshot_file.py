@@ -0,0 +1,42 @@
+import pytest
+
+from feedback_snapshot import FeedbackLookups, load_snapshot
+from snapshot_file import map_snapshot_file, snapshot_file_path, write_snapshot_file
+
+
+def test_snapshot_file_path():
+    assert snapshot_file_path('/srv/course_feedback.0123456789abcdef.db') == '/srv/course_feedback.0123456789abcdef.snapshot'
+
+
+@pytest.mark.parametrize('aliases', [True, False])
+def test_round_trip(feedback_db, feedback_db_without_aliases, tmp_path, aliases):
+    db_path = feedback_db if aliases else feedback_db_without_aliases
+    path = str(tmp_path / 'course_feedback.snapshot')
+    write_snapshot_file(load_snapshot(db_path, compact=True), path, 'v1')
+
+    mapped = FeedbackLookups(**map_snapshot_file(path, 'v1'))
+    plain = load_snapshot(db_path, compact=False)
+    for field in FeedbackLookups._fields:
+        expected, table = getattr(plain, field), getattr(mapped, field)
+        if expected is None:
+            assert table is None
+            continue
+        assert dict(table.items()) == expected
+        for key, value in expected.items():
+            assert table.get(key) == value
+    assert mapped.course_stats.get(('HIST', 10100)) is None
+    assert mapped.professor_ids.get(('doe', 'HIST')) is None
+
+
+def test_other_version_or_missing_file(feedback_db, tmp_path):
+    path = str(tmp_path / 'course_feedback.snapshot')
+    assert map_snapshot_file(path, 'v1') is None
+    write_snapshot_file(load_snapshot(feedback_db, compact=True), path, 'v1')
+    assert map_snapshot_file(path, 'v2') is None
+
+
+def test_not_a_snapshot_file(tmp_path):
+    path = tmp_path / 'course_feedback.snapshot'
+    path.write_bytes(b'SQLite format 3\0' + bytes(64))
+    with pytest.raises(ValueError):
+        map_snapshot_file(str(path), 'v1')